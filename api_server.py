@@ -0,0 +1,455 @@
+# api_server.py
+#
+# Локальный HTTP/JSON API для базы задач.
+# Запуск: python api_server.py --host 127.0.0.1 --port 8765 --db tasks.db
+#
+# GET    /tasks?status=...&priority=...   список задач (поддерживает ETag / If-None-Match)
+#        &limit=...&after=...             страницы по возрастанию id: after — id последней
+#                                         полученной задачи, следующий after — в X-Next-After
+# GET    /tasks/search?q=...              поиск по названию и описанию (поддерживает ETag)
+# GET    /tasks/<id>                      одна задача
+# POST   /tasks                           создание задачи
+# PUT    /tasks/<id>                      обновление полей задачи
+# POST   /tasks/<id>/move                 смена статуса: {"status": "В работе"}
+# DELETE /tasks/<id>                      удаление задачи
+
+import argparse
+import asyncio
+import json
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlite3 import Error
+from urllib.parse import urlsplit, parse_qs
+
+import queries
+from database import close_connection, create_table, get_connection
+from queries import TASK_COLUMNS, TASK_FIELDS
+
+EDITABLE_COLUMNS = ['task', 'description', 'due_date', 'due_time', 'priority', 'status']
+STATUSES = ['Сделать', 'В работе', 'На проверке', 'Завершено']
+PRIORITIES = ['Низкий', 'Средний', 'Высокий']
+# Форматы даты и времени, которые ожидает интерфейс (yyyy-MM-dd, HH:mm)
+DATE_FORMAT = '%Y-%m-%d'
+TIME_FORMAT = '%H:%M'
+
+# Максимальное число операций записи в одной транзакции
+WRITE_BATCH_SIZE = 256
+MAX_BODY_SIZE = 1024 * 1024
+# Размер страницы списка задач по умолчанию и наибольший допустимый
+LIST_PAGE_SIZE = 200
+MAX_LIST_PAGE_SIZE = 1000
+# id задачи — INTEGER SQLite (64 бита со знаком)
+MAX_TASK_ID = 2 ** 63 - 1
+
+HTTP_REASONS = {
+    200: 'OK', 201: 'Created', 204: 'No Content', 304: 'Not Modified',
+    400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 500: 'Internal Server Error',
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def current_timestamp():
+    # Тот же формат, что и у completed_at в интерфейсе: yyyy-MM-dd HH:mm
+    return datetime.now().strftime('%Y-%m-%d %H:%M')
+
+
+def row_to_dict(row):
+    return dict(zip(TASK_COLUMNS, row))
+
+
+def int_param(query, name, default, minimum, maximum):
+    """Целочисленный параметр строки запроса в пределах [minimum, maximum]."""
+    if name not in query:
+        return default
+    try:
+        value = int(query[name])
+    except ValueError:
+        value = None
+    if value is None or not minimum <= value <= maximum:
+        raise ApiError(400, f'Неверный параметр {name}: {query[name]!r}')
+    return value
+
+
+class ReaderPool:
+    """
+    Пул потоков для чтения: у каждого потока своё постоянное соединение
+    (database.get_connection), которое переиспользуется между запросами.
+    """
+    def __init__(self, db_file, size=4):
+        self.db_file = db_file
+        self.size = size
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='reader')
+
+    def _run(self, query, params):
+        return get_connection(self.db_file).execute(query, params).fetchall()
+
+    async def fetchall(self, query, params=()):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._run, query, params)
+
+    def close(self):
+        # Соединение закрывается в том же потоке, где открыто: барьер
+        # гарантирует, что каждый поток пула получит ровно одну задачу закрытия
+        barrier = threading.Barrier(self.size)
+
+        def close_own():
+            barrier.wait()
+            close_connection(self.db_file)
+
+        for future in [self.executor.submit(close_own) for _ in range(self.size)]:
+            future.result()
+        self.executor.shutdown(wait=True)
+
+
+class WriterQueue:
+    """
+    Единственный писатель: операции ставятся в очередь, накопившиеся за время
+    предыдущего коммита выполняются одной транзакцией. Каждая операция
+    обёрнута в SAVEPOINT, так что ошибка в одной не откатывает остальные.
+    """
+    def __init__(self, db_file, batch_size=WRITE_BATCH_SIZE):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='writer')
+        self.conn = None
+        self.task = None
+
+    def _open(self):
+        self.conn = get_connection(self.db_file)
+        # Явное управление транзакциями и WAL, чтобы читатели не ждали писателя
+        self.conn.isolation_level = None
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self._open)
+        self.task = asyncio.create_task(self._run())
+
+    async def submit(self, operation, *args):
+        """Ставит операцию в очередь и ждёт результата её коммита."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((operation, args, future))
+        return await future
+
+    def _apply_batch(self, batch):
+        results = []
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            for operation, args in batch:
+                cursor.execute('SAVEPOINT op')
+                try:
+                    results.append((True, operation(cursor, *args)))
+                    cursor.execute('RELEASE op')
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO op')
+                    cursor.execute('RELEASE op')
+                    results.append((False, e))
+            cursor.execute('COMMIT')
+        except Error:
+            cursor.execute('ROLLBACK')
+            raise
+        return results
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self._apply_batch, [(op, args) for op, args, _ in batch]
+                )
+            except Exception as e:
+                results = [(False, e)] * len(batch)
+            for (_, _, future), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        loop = asyncio.get_running_loop()
+        if self.conn is not None:
+            await loop.run_in_executor(self.executor, close_connection, self.db_file)
+        self.executor.shutdown(wait=True)
+
+
+# Операции записи выполняются в потоке писателя внутри общей транзакции
+
+def op_create(cursor, values):
+    completed_at = current_timestamp() if values['status'] == 'Завершено' else None
+    cursor.execute(queries.INSERT_TASK, queries.task_params(
+        values['task'], values['description'], values.get('due_date'), values.get('due_time'),
+        values['priority'], values['status'], completed_at
+    ))
+    return row_to_dict(cursor.execute(queries.SELECT_TASK, {'id': cursor.lastrowid}).fetchone())
+
+
+def op_update(cursor, task_id, values):
+    current = cursor.execute(queries.SELECT_TASK, {'id': task_id}).fetchone()
+    if current is None:
+        raise ApiError(404, 'Задача не найдена.')
+    current = row_to_dict(current)
+    if 'status' in values and values['status'] != current['status']:
+        # Та же логика, что и в интерфейсе: completed_at только у завершённых
+        values['completed_at'] = current_timestamp() if values['status'] == 'Завершено' else None
+    if values:
+        # Неизменённые поля берутся из текущей строки: запрос всегда один и тот же
+        current.update(values)
+        cursor.execute(queries.UPDATE_TASK, {column: current[column] for column in TASK_FIELDS + ('id',)})
+    return row_to_dict(cursor.execute(queries.SELECT_TASK, {'id': task_id}).fetchone())
+
+
+def op_delete(cursor, task_id):
+    cursor.execute(queries.DELETE_TASK, {'id': task_id})
+    if cursor.rowcount == 0:
+        raise ApiError(404, 'Задача не найдена.')
+    return None
+
+
+def is_formatted(value, value_format):
+    # strptime принимает и "2025-1-5", поэтому сверяем с обратным форматированием
+    try:
+        return isinstance(value, str) and datetime.strptime(value, value_format).strftime(value_format) == value
+    except ValueError:
+        return False
+
+
+def validate_task(body, partial=False):
+    if not isinstance(body, dict):
+        raise ApiError(400, 'Ожидается JSON-объект.')
+    unknown = set(body) - set(EDITABLE_COLUMNS)
+    if unknown:
+        raise ApiError(400, f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    values = {column: body[column] for column in EDITABLE_COLUMNS if column in body}
+    if not partial:
+        values.setdefault('description', '')
+        values.setdefault('priority', 'Средний')
+        values.setdefault('status', 'Сделать')
+    if 'task' in values or not partial:
+        task_text = values.get('task')
+        if not isinstance(task_text, str) or not task_text.strip():
+            raise ApiError(400, 'Задача не может быть пустой.')
+        values['task'] = task_text.strip()
+    if not isinstance(values.get('description', ''), str):
+        raise ApiError(400, 'Описание должно быть строкой.')
+    for column, value_format, label in (('due_date', DATE_FORMAT, 'дата'), ('due_time', TIME_FORMAT, 'время')):
+        if values.get(column) is not None and not is_formatted(values[column], value_format):
+            raise ApiError(400, f'Неверное поле {column} ({label}): {values[column]!r}')
+    if 'priority' in values and values['priority'] not in PRIORITIES:
+        raise ApiError(400, f'Неверный приоритет: {values["priority"]}')
+    if 'status' in values and values['status'] not in STATUSES:
+        raise ApiError(400, f'Неверный статус: {values["status"]}')
+    return values
+
+
+class TaskApi:
+    def __init__(self, db_file='tasks.db', readers=4):
+        self.db_file = db_file
+        self.readers = ReaderPool(db_file, readers)
+        self.writer = WriterQueue(db_file)
+
+    async def start(self):
+        create_table(self.db_file)
+        await self.writer.start()
+
+    async def close(self):
+        await self.writer.close()
+        self.readers.close()
+
+    async def version(self):
+        # Номер последнего изменения из журнала task_changes — общий для всех процессов
+        rows = await self.readers.fetchall(queries.SELECT_CHANGE_VERSION)
+        return rows[0][0]
+
+    async def list_tasks(self, query):
+        """Страница списка и заголовки ответа (X-Next-After, если страница не последняя)."""
+        # Фильтр по статусу — список из одного статуса, как у колонок доски
+        statuses = [query['status']] if 'status' in query else queries.STATUSES
+        limit = int_param(query, 'limit', LIST_PAGE_SIZE, 1, MAX_LIST_PAGE_SIZE)
+        after = int_param(query, 'after', 0, 0, MAX_TASK_ID)
+        sql, params = queries.list_tasks_query(query.get('priority', 'Все'), statuses, after, limit)
+        rows = await self.readers.fetchall(sql, params)
+        headers = {'X-Next-After': str(rows[-1][0])} if len(rows) == limit else {}
+        return [row_to_dict(row) for row in rows], headers
+
+    async def search_tasks(self, query):
+        sql, params = queries.load_tasks_query(query.get('q', ''))
+        rows = await self.readers.fetchall(sql, params)
+        return [row_to_dict(row) for row in rows]
+
+    async def get_task(self, task_id):
+        rows = await self.readers.fetchall(queries.SELECT_TASK, {'id': task_id})
+        if not rows:
+            raise ApiError(404, 'Задача не найдена.')
+        return row_to_dict(rows[0])
+
+    async def handle(self, method, path, headers, body):
+        """Возвращает (код ответа, тело ответа, дополнительные заголовки)."""
+        url = urlsplit(path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+        if not parts or parts[0] != 'tasks':
+            raise ApiError(404, 'Неизвестный путь.')
+
+        if len(parts) == 1 or (len(parts) == 2 and parts[1] == 'search'):
+            if method == 'GET':
+                # ETag зависит от версии базы и параметров запроса
+                version = await self.version()
+                etag = f'"{version}-{zlib.crc32(path.encode("utf-8")):08x}"'
+                if headers.get('if-none-match') == etag:
+                    return 304, None, {'ETag': etag}
+                if len(parts) == 1:
+                    result, extra_headers = await self.list_tasks(query)
+                else:
+                    result, extra_headers = await self.search_tasks(query), {}
+                return 200, result, {'ETag': etag, **extra_headers}
+            if method == 'POST' and len(parts) == 1:
+                values = validate_task(self.parse_json(body))
+                return 201, await self.writer.submit(op_create, values), {}
+            raise ApiError(405, 'Метод не поддерживается.')
+
+        try:
+            task_id = int(parts[1])
+        except ValueError:
+            raise ApiError(404, 'Неверный ID задачи.')
+        if not 0 < task_id <= MAX_TASK_ID:
+            # Такой id не поместился бы в INTEGER SQLite — задачи с ним нет
+            raise ApiError(404, 'Задача не найдена.')
+
+        if len(parts) == 2:
+            if method == 'GET':
+                return 200, await self.get_task(task_id), {}
+            if method in ('PUT', 'PATCH'):
+                values = validate_task(self.parse_json(body), partial=True)
+                return 200, await self.writer.submit(op_update, task_id, values), {}
+            if method == 'DELETE':
+                await self.writer.submit(op_delete, task_id)
+                return 204, None, {}
+            raise ApiError(405, 'Метод не поддерживается.')
+
+        if len(parts) == 3 and parts[2] == 'move':
+            if method != 'POST':
+                raise ApiError(405, 'Метод не поддерживается.')
+            values = validate_task(self.parse_json(body), partial=True)
+            if list(values) != ['status']:
+                raise ApiError(400, 'Ожидается только поле status.')
+            return 200, await self.writer.submit(op_update, task_id, values), {}
+
+        raise ApiError(404, 'Неизвестный путь.')
+
+    @staticmethod
+    def parse_json(body):
+        try:
+            return json.loads(body.decode('utf-8')) if body else {}
+        except (UnicodeDecodeError, ValueError) as e:
+            raise ApiError(400, f'Неверный JSON: {e}')
+
+    async def serve_connection(self, reader, writer):
+        # Простейший HTTP/1.1 с keep-alive: разбор строки запроса, заголовков и тела
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('utf-8').split()
+                except (UnicodeDecodeError, ValueError):
+                    await self.respond(writer, 400, {'error': 'Неверный запрос.'}, {}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, 400, {'error': 'Неверный Content-Length.'}, {}, False)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self.respond(writer, 413, {'error': 'Слишком большой запрос.'}, {}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    status, result, extra = await self.handle(method.upper(), path, headers, body)
+                except ApiError as e:
+                    status, result, extra = e.status, {'error': e.message}, {}
+                except Exception as e:
+                    status, result, extra = 500, {'error': str(e)}, {}
+                await self.respond(writer, status, result, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def respond(writer, status, result, extra_headers, keep_alive):
+        payload = b'' if result is None else json.dumps(result, ensure_ascii=False).encode('utf-8')
+        headers = [
+            f'HTTP/1.1 {status} {HTTP_REASONS.get(status, "")}',
+            f'Content-Length: {len(payload)}',
+            f'Connection: {"keep-alive" if keep_alive else "close"}',
+        ]
+        if payload:
+            headers.append('Content-Type: application/json; charset=utf-8')
+        headers.extend(f'{name}: {value}' for name, value in extra_headers.items())
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + payload)
+        await writer.drain()
+
+
+async def run_server(host='127.0.0.1', port=8765, db_file='tasks.db', readers=4):
+    api = TaskApi(db_file, readers)
+    await api.start()
+    server = await asyncio.start_server(api.serve_connection, host, port)
+    print(f'API задач доступно на http://{host}:{port}/tasks')
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await api.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Локальный HTTP/JSON API для базы задач.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--db', default='tasks.db')
+    parser.add_argument('--readers', type=int, default=4, help='Размер пула соединений для чтения')
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_server(args.host, args.port, args.db, args.readers))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,155 @@
+# archive.py
+#
+# Холодное хранилище для давно завершённых задач.
+# Архив — отдельный файл базы (tasks_archive.db рядом с tasks.db), подключаемый
+# через ATTACH под именем archive. Перенос идёт небольшими пачками, чтобы не
+# блокировать интерфейс, после чего освобождённое место возвращается через
+# incremental_vacuum небольшими шагами. Разовый перевод старой базы в режим
+# auto_vacuum=INCREMENTAL (полный VACUUM) выполняется при запуске в отдельном
+# потоке со своим соединением. Вместе с задачами переносятся их ключи
+# импорта, чтобы повторный импорт выгрузки не создавал архивные задачи заново.
+
+import os
+import threading
+from datetime import datetime, timedelta
+from sqlite3 import Error
+
+import queries
+from database import create_connection
+from instrumentation import logger, timed
+
+# Через сколько дней после завершения задача уходит в архив
+ARCHIVE_AFTER_DAYS = 30
+# Сколько задач переносить за один шаг
+ARCHIVE_BATCH_SIZE = 500
+# Очистка запускается, только если свободных страниц набралось больше порога
+VACUUM_MIN_FREE_PAGES = 256
+# Сколько страниц возвращать файловой системе за один шаг
+VACUUM_PAGES_PER_STEP = 1024
+
+# Режим PRAGMA auto_vacuum, при котором доступен incremental_vacuum
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def archive_path(db_file='tasks.db'):
+    base, ext = os.path.splitext(db_file)
+    return f'{base}_archive{ext or ".db"}'
+
+
+def attach_archive(conn, db_file='tasks.db'):
+    """Подключает базу архива к соединению conn (повторный вызов ничего не делает)."""
+    attached = {row[1] for row in conn.execute('PRAGMA database_list').fetchall()}
+    if 'archive' in attached:
+        return
+    conn.execute('ATTACH DATABASE ? AS archive', (archive_path(db_file),))
+    # auto_vacuum можно включить только до создания первой таблицы
+    conn.execute('PRAGMA archive.auto_vacuum = INCREMENTAL')
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS archive.tasks (
+            id INTEGER PRIMARY KEY,
+            task TEXT NOT NULL,
+            description TEXT,
+            due_date TEXT,
+            due_time TEXT,
+            priority TEXT,
+            status TEXT,
+            completed_at TEXT,
+            archived_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS archive.tasks_completed ON tasks (completed_at, id);
+        CREATE TABLE IF NOT EXISTS archive.task_import_keys (
+            task_id INTEGER PRIMARY KEY,
+            content_hash TEXT,
+            external_id TEXT
+        );
+        CREATE INDEX IF NOT EXISTS archive.task_import_keys_hash ON task_import_keys (content_hash);
+    ''')
+
+
+def archive_batch(conn, days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Переносит в архив до batch_size задач, завершённых более days дней назад.
+    Возвращает число перенесённых задач.
+    """
+    now = datetime.now()
+    cutoff = (now - timedelta(days=days)).strftime('%Y-%m-%d %H:%M')
+    # Транзакция с ATTACH в режиме WAL не атомарна между файлами, поэтому
+    # перенос идёт двумя транзакциями: сначала копия (INSERT OR REPLACE по id,
+    # повторять можно сколько угодно), затем удаление только тех задач, что
+    # уже есть в архиве. После сбоя между ними задачи остаются в обеих базах
+    # и переносятся заново на следующем шаге; потерять задачу нельзя.
+    with timed('archive.batch'):
+        task_ids = [row[0] for row in conn.execute(
+            queries.ARCHIVE_CANDIDATES, {'cutoff': cutoff, 'limit': batch_size}
+        ).fetchall()]
+        if not task_ids:
+            return 0
+        params = {'ids': queries.ids_param(task_ids), 'archived_at': now.strftime('%Y-%m-%d %H:%M')}
+        with conn:
+            conn.execute(queries.ARCHIVE_COPY, params)
+            # Триггер удаления tasks сотрёт ключи импорта — сохраняем их в архиве
+            conn.execute(queries.ARCHIVE_COPY_IMPORT_KEYS, params)
+        with conn:
+            conn.execute(queries.ARCHIVE_DELETE, params)
+    logger.info('В архив перенесено задач: %d', len(task_ids))
+    return len(task_ids)
+
+
+def restore_tasks(conn, task_ids):
+    """Возвращает задачи из архива в колонку "Сделать" (так же в два шага, см. archive_batch)."""
+    params = {'ids': queries.ids_param(task_ids)}
+    with conn:
+        conn.execute(queries.RESTORE_COPY, params)
+        conn.execute(queries.RESTORE_IMPORT_KEYS, params)
+    with conn:
+        conn.execute(queries.RESTORE_DELETE, params)
+        conn.execute(queries.RESTORE_DELETE_IMPORT_KEYS, params)
+
+
+def convert_to_incremental(db_file='tasks.db'):
+    """
+    Переводит main и archive в режим auto_vacuum=INCREMENTAL полным VACUUM,
+    если это ещё не сделано. VACUUM большой базы длится секунды, поэтому
+    функция открывает собственное соединение и вызывается вне потока интерфейса.
+    """
+    conn = create_connection(db_file)
+    if conn is None:
+        return
+    try:
+        attach_archive(conn, db_file)
+        for schema in ('main', 'archive'):
+            if conn.execute(f'PRAGMA {schema}.auto_vacuum').fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+                continue
+            with timed('archive.convert'):
+                conn.execute(f'PRAGMA {schema}.auto_vacuum = INCREMENTAL')
+                conn.execute(f'VACUUM {schema}')
+            logger.info('База %s переведена в режим incremental_vacuum', schema)
+    except Error as e:
+        logger.error('Ошибка перевода базы в режим incremental_vacuum: %s', e)
+    finally:
+        conn.close()
+
+
+def start_conversion(db_file='tasks.db'):
+    """Запускает convert_to_incremental в фоновом потоке."""
+    thread = threading.Thread(target=convert_to_incremental, args=(db_file,), name='vacuum', daemon=True)
+    thread.start()
+    return thread
+
+
+def reclaim_space(conn, schema='main'):
+    """
+    Возвращает файловой системе до VACUUM_PAGES_PER_STEP страниц, освободившихся
+    после переноса задач. Базы, ещё не переведённые в auto_vacuum=INCREMENTAL
+    (см. convert_to_incremental), пропускаются. Возвращает True, если место
+    было освобождено.
+    """
+    free_pages = conn.execute(f'PRAGMA {schema}.freelist_count').fetchone()[0]
+    if free_pages < VACUUM_MIN_FREE_PAGES:
+        return False
+    if conn.execute(f'PRAGMA {schema}.auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+        return False
+    with timed('archive.vacuum'):
+        conn.execute(f'PRAGMA {schema}.incremental_vacuum({VACUUM_PAGES_PER_STEP})').fetchall()
+    logger.info('Освобождение места в %s: свободных страниц было %d', schema, free_pages)
+    return True
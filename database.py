@@ -1,21 +1,81 @@
 # database_module.py
 
 import sqlite3
+import threading
 from sqlite3 import Error
 
+from instrumentation import logger, timed, sql_label
+from queries import STATEMENT_CACHE_SIZE
+from search import create_search_index
+from views import create_views_table
+from importer import create_import_index
+from recurrence import create_recurrence_tables
+
+# Сколько последних записей журнала изменений хранить в базе
+CHANGE_LOG_LIMIT = 10000
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Курсор, замеряющий время выполнения каждого SQL-запроса."""
+    def execute(self, sql, parameters=()):
+        with timed(sql_label(sql)):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with timed(sql_label(sql)):
+            return super().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        with timed(sql_label(sql_script)):
+            return super().executescript(sql_script)
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
 def create_connection(db_file='tasks.db'):
     """Создание соединения с базой данных SQLite."""
     conn = None
     try:
-        conn = sqlite3.connect(db_file)
+        conn = sqlite3.connect(db_file, factory=InstrumentedConnection, cached_statements=STATEMENT_CACHE_SIZE)
         return conn
     except Error as e:
-        print(f"Ошибка подключения к базе данных: {e}")
+        logger.error("Ошибка подключения к базе данных: %s", e)
+    return conn
+
+_shared_connections = threading.local()
+
+def get_connection(db_file='tasks.db'):
+    """
+    Постоянное соединение, одно на файл базы и поток (соединение sqlite3
+    нельзя использовать из другого потока). Открывается при первом обращении
+    и живёт до конца потока или close_connection, поэтому кэш подготовленных
+    запросов sqlite3 прогревается один раз.
+    """
+    connections = getattr(_shared_connections, 'connections', None)
+    if connections is None:
+        connections = _shared_connections.connections = {}
+    conn = connections.get(db_file)
+    if conn is None:
+        conn = create_connection(db_file)
+        if conn is not None:
+            connections[db_file] = conn
     return conn
 
-def create_table():
+def close_connection(db_file='tasks.db'):
+    """Закрывает постоянное соединение текущего потока с db_file, если оно открыто."""
+    conn = getattr(_shared_connections, 'connections', {}).pop(db_file, None)
+    if conn is not None:
+        conn.close()
+
+def create_table(db_file='tasks.db'):
     """Создание таблицы tasks, если она не существует."""
-    conn = create_connection()
+    conn = create_connection(db_file)
     if conn is not None:
         create_table_sql = '''
         CREATE TABLE IF NOT EXISTS tasks (
@@ -29,13 +89,146 @@ def create_table():
             completed_at TEXT
         );
         '''
+        # Журнал изменений: каждая запись в tasks (из любого процесса)
+        # получает монотонно возрастающий номер seq
+        create_change_log_sql = f'''
+        CREATE TABLE IF NOT EXISTS task_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS tasks_log_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO task_changes (task_id) VALUES (NEW.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS tasks_log_update AFTER UPDATE ON tasks
+        BEGIN
+            INSERT INTO task_changes (task_id) VALUES (NEW.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS tasks_log_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT INTO task_changes (task_id) VALUES (OLD.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS task_changes_prune AFTER INSERT ON task_changes
+        BEGIN
+            DELETE FROM task_changes WHERE seq <= NEW.seq - {CHANGE_LOG_LIMIT};
+        END;
+        '''
+        # Счётчики задач по статусу и приоритету для заголовков колонок.
+        # Триггеры поправляют их при каждой записи, так что доске не нужно
+        # ни пересчитывать COUNT(*), ни загружать сами задачи.
+        create_counts_sql = '''
+        CREATE TABLE IF NOT EXISTS task_counts (
+            status TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (status, priority)
+        ) WITHOUT ROWID;
+        CREATE TRIGGER IF NOT EXISTS tasks_count_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO task_counts (status, priority, count)
+            VALUES (IFNULL(NEW.status, ''), IFNULL(NEW.priority, ''), 1)
+            ON CONFLICT (status, priority) DO UPDATE SET count = count + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS tasks_count_delete AFTER DELETE ON tasks
+        BEGIN
+            UPDATE task_counts SET count = count - 1
+            WHERE status = IFNULL(OLD.status, '') AND priority = IFNULL(OLD.priority, '');
+        END;
+        CREATE TRIGGER IF NOT EXISTS tasks_count_update AFTER UPDATE OF status, priority ON tasks
+        WHEN OLD.status IS NOT NEW.status OR OLD.priority IS NOT NEW.priority
+        BEGIN
+            UPDATE task_counts SET count = count - 1
+            WHERE status = IFNULL(OLD.status, '') AND priority = IFNULL(OLD.priority, '');
+            INSERT INTO task_counts (status, priority, count)
+            VALUES (IFNULL(NEW.status, ''), IFNULL(NEW.priority, ''), 1)
+            ON CONFLICT (status, priority) DO UPDATE SET count = count + 1;
+        END;
+        '''
+        # Первичное заполнение — один агрегат по уже существующим задачам
+        fill_counts_sql = '''
+        INSERT INTO task_counts (status, priority, count)
+        SELECT IFNULL(status, ''), IFNULL(priority, ''), COUNT(*) FROM tasks GROUP BY 1, 2
+        '''
+        # Индексы для выборки давно завершённых задач при архивации
+        # и для условий по сроку в сохранённых видах
+        create_indexes_sql = '''
+        CREATE INDEX IF NOT EXISTS tasks_status_completed ON tasks (status, completed_at);
+        CREATE INDEX IF NOT EXISTS tasks_due ON tasks (due_date, due_time);
+        '''
         try:
             c = conn.cursor()
+            # Действует только для новой базы; существующие переводит archive.convert_to_incremental
+            c.execute('PRAGMA auto_vacuum = INCREMENTAL')
             c.execute(create_table_sql)
+            c.executescript(create_change_log_sql)
+            c.executescript(create_indexes_sql)
+            counts_exist = c.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_counts'"
+            ).fetchone() is not None
+            c.executescript(create_counts_sql)
+            if not counts_exist:
+                c.execute(fill_counts_sql)
+            create_search_index(conn)
+            create_views_table(conn)
+            create_import_index(conn)
+            create_recurrence_tables(conn)
             conn.commit()
         except Error as e:
-            print(f"Ошибка создания таблицы: {e}")
+            logger.error("Ошибка создания таблицы: %s", e)
         finally:
             conn.close()
     else:
-        print("Ошибка! Не удалось создать соединение с базой данных.")
+        logger.error("Ошибка! Не удалось создать соединение с базой данных.")
+
+class ChangeWatcher:
+    """
+    Отслеживание изменений в базе данных, сделанных другими соединениями.
+
+    Держит одно постоянное соединение: PRAGMA data_version меняется только
+    после фиксации транзакции другим соединением, поэтому опрос без изменений
+    почти ничего не стоит. Сами изменения читаются из журнала task_changes
+    начиная с последнего обработанного seq.
+    """
+    def __init__(self, db_file='tasks.db'):
+        self.conn = create_connection(db_file)
+        self.data_version = None
+        self.last_seq = 0
+        self.mark_synced()
+
+    def _current_data_version(self):
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def mark_synced(self):
+        """Запоминает текущее состояние базы как уже отображённое."""
+        self.data_version = self._current_data_version()
+        row = self.conn.execute('SELECT MAX(seq) FROM task_changes').fetchone()
+        self.last_seq = row[0] or 0
+
+    def has_changes(self):
+        """Проверяет, фиксировал ли кто-то изменения с момента последней синхронизации."""
+        return self._current_data_version() != self.data_version
+
+    def fetch_changed_ids(self):
+        """
+        Возвращает множество id задач, изменённых с момента последней синхронизации.
+        Возвращает None, если часть журнала уже удалена и нужна полная перезагрузка.
+        """
+        self.data_version = self._current_data_version()
+        min_seq, max_seq = self.conn.execute('SELECT MIN(seq), MAX(seq) FROM task_changes').fetchone()
+        if max_seq is None or max_seq <= self.last_seq:
+            return set()
+        if min_seq > self.last_seq + 1:
+            self.last_seq = max_seq
+            return None
+        cursor = self.conn.execute(
+            'SELECT DISTINCT task_id FROM task_changes WHERE seq > ? AND seq <= ?',
+            (self.last_seq, max_seq)
+        )
+        changed_ids = {row[0] for row in cursor.fetchall()}
+        self.last_seq = max_seq
+        return changed_ids
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,273 @@
+# gui_perf_test.py
+#
+# Тесты производительности интерфейса TaskManager без экрана
+# (QT_QPA_PLATFORM=offscreen) на заранее заполненной большой базе.
+# Каждый сценарий — ввод в строку поиска, перетаскивание между колонками,
+# прокрутка, открытие и закрытие диалогов — проверяется по бюджету времени
+# и по пиковому объёму Python-памяти (tracemalloc).
+#
+# Запуск:
+#     python -m pytest -q gui_perf_test.py
+#     GUI_PERF_TASKS=100000 GUI_PERF_SCALE=2 python -m pytest -q gui_perf_test.py
+# GUI_PERF_TASKS — размер базы, GUI_PERF_SCALE — множитель бюджетов для
+# медленных машин.
+
+import os
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+from PyQt5.QtCore import QByteArray, QMimeData, QPoint, Qt
+from PyQt5.QtGui import QDropEvent
+from PyQt5.QtTest import QTest
+from PyQt5.QtWidgets import QApplication, QMessageBox
+
+TASK_COUNT = int(os.environ.get('GUI_PERF_TASKS', 20000))
+BUDGET_SCALE = float(os.environ.get('GUI_PERF_SCALE', 1))
+
+# Бюджеты сценариев: (мс, МБ пиковой Python-памяти), примерно вдвое выше
+# замеров на рабочей машине. Полная загрузка и первые символы поиска (под
+# короткий запрос подходят почти все задачи) растут с размером базы, поэтому
+# их бюджет задан на 10 000 задач.
+BUDGETS = {
+    'load_tasks': (600, 24),
+    'keystroke': (400, 8),
+    'drop': (50, 1),
+    'scroll_frame': (20, 1),
+    'dialog': (80, 2),
+}
+# Сценарии, бюджет которых пропорционален числу задач
+SCALED_BUDGETS = {'load_tasks', 'keystroke'}
+
+WORDS = [
+    'deploy', 'release', 'отчёт', 'встреча', 'review', 'backup', 'сервер', 'клиент',
+    'invoice', 'миграция', 'тесты', 'документация', 'рефакторинг', 'design', 'бюджет',
+]
+STATUSES = ['Сделать', 'В работе', 'На проверке', 'Завершено']
+PRIORITIES = ['Низкий', 'Средний', 'Высокий']
+
+
+def budget(name):
+    milliseconds, megabytes = BUDGETS[name]
+    if name in SCALED_BUDGETS:
+        factor = max(1.0, TASK_COUNT / 10000)
+        milliseconds *= factor
+        megabytes *= factor
+    return milliseconds * BUDGET_SCALE, megabytes
+
+
+@contextmanager
+def latency(name, results):
+    """Замер одного действия; время складывается в results[name]."""
+    start = time.perf_counter()
+    yield
+    results.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+
+
+def peak_allocation(action):
+    """Пиковый прирост Python-памяти (МБ) при выполнении action."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        action()
+        return (tracemalloc.get_traced_memory()[1] - baseline) / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def check_budget(name, samples, allocated):
+    # Время и память меряются в разных проходах: tracemalloc сам замедляет код
+    limit_ms, limit_mb = budget(name)
+    worst = max(samples)
+    print(f'{name}: худший {worst:.1f} мс (бюджет {limit_ms:.0f}), память {allocated:.2f} МБ (бюджет {limit_mb:.0f})')
+    assert worst <= limit_ms, f'{name}: {worst:.1f} мс при бюджете {limit_ms:.0f} мс'
+    assert allocated <= limit_mb, f'{name}: {allocated:.1f} МБ при бюджете {limit_mb:.0f} МБ'
+
+
+def seed_database(path, count):
+    """Заполняет базу случайными задачами (схему создаёт database.create_table)."""
+    from database import create_table
+    create_table(path)
+    random.seed(count)
+    today = date.today()
+    rows = []
+    for index in range(count):
+        status = random.choice(STATUSES)
+        title = ' '.join(random.sample(WORDS, 3)) + f' {index}'
+        due = today + timedelta(days=random.randint(-60, 60))
+        rows.append((
+            title, f'описание задачи {index}: ' + ' '.join(random.sample(WORDS, 5)),
+            due.isoformat(), f'{random.randint(8, 19):02d}:{random.choice(("00", "30"))}',
+            random.choice(PRIORITIES), status,
+            f'{(today - timedelta(days=random.randint(0, 20))).isoformat()} 12:00' if status == 'Завершено' else None,
+        ))
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany(
+            'INSERT INTO tasks (task, description, due_date, due_time, priority, status, completed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+        )
+    conn.close()
+
+
+@pytest.fixture(scope='module')
+def qapp():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(scope='module')
+def seeded_dir():
+    # Приложение открывает tasks.db и icons/ относительно текущего каталога
+    source = os.path.dirname(os.path.abspath(__file__))
+    directory = tempfile.mkdtemp(prefix='gui_perf_')
+    shutil.copytree(os.path.join(source, 'icons'), os.path.join(directory, 'icons'))
+    previous = os.getcwd()
+    os.chdir(directory)
+    seed_database('tasks.db', TASK_COUNT)
+    yield directory
+    os.chdir(previous)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture(scope='module')
+def window(qapp, seeded_dir):
+    # Модальные окна остановили бы тест — любое сообщение об ошибке считается провалом
+    messages = []
+    original = QMessageBox.warning, QMessageBox.critical, QMessageBox.information
+    QMessageBox.warning = QMessageBox.critical = staticmethod(lambda *args, **kwargs: messages.append(args[2]))
+    QMessageBox.information = staticmethod(lambda *args, **kwargs: None)
+    import main
+    manager = main.TaskManager()
+    # Фоновые таймеры не должны вмешиваться в замеры
+    for timer in (manager.timer, manager.sync_timer, manager.archive_timer):
+        timer.stop()
+    manager.resize(1600, 700)
+    manager.show()
+    QTest.qWaitForWindowExposed(manager)
+    manager.messages = messages
+    yield manager
+    manager.close()
+    manager.change_watcher.close()
+    QMessageBox.warning, QMessageBox.critical, QMessageBox.information = original
+
+
+@pytest.fixture(autouse=True)
+def no_error_messages(request):
+    yield
+    if 'window' in request.fixturenames:
+        window = request.getfixturevalue('window')
+        assert not window.messages, window.messages
+        window.messages.clear()
+
+
+def test_load_tasks(window):
+    results = {}
+    for _ in range(3):
+        with latency('load_tasks', results):
+            window.load_tasks()
+            QApplication.processEvents()
+    assert len(window.task_items) == TASK_COUNT
+    check_budget('load_tasks', results['load_tasks'], peak_allocation(window.load_tasks))
+
+
+def type_key(window, key):
+    # Поиск запускается таймером после паузы в наборе; в тесте таймер
+    # срабатывает сразу, чтобы измерить перечитывание доски после клавиши
+    QTest.keyClick(window.search_input, key)
+    window.search_timer.stop()
+    window.search_tasks()
+    QApplication.processEvents()
+
+
+def test_search_typing(window):
+    results = {}
+    for character in 'deploy':
+        with latency('keystroke', results):
+            type_key(window, character)
+    assert window.task_items, 'поиск по "deploy" ничего не нашёл'
+    allocated = peak_allocation(lambda: type_key(window, Qt.Key_Backspace))
+    window.search_input.clear()
+    window.search_timer.stop()
+    window.search_tasks()
+    QApplication.processEvents()
+    check_budget('keystroke', results['keystroke'], allocated)
+
+
+def drop_task(target, task_id):
+    # QDrag.exec_ без экрана не завершается, поэтому событие сброса строится напрямую
+    mime_data = QMimeData()
+    mime_data.setData('application/x-task-id', QByteArray(str(task_id).encode('utf-8')))
+    event = QDropEvent(QPoint(5, 5), Qt.MoveAction, mime_data, Qt.LeftButton, Qt.NoModifier)
+    target.dropEvent(event)
+    QApplication.processEvents()
+
+
+def test_drag_and_drop(window):
+    results = {}
+    source, target = window.to_do_list, window.in_progress_list
+    task_ids = [source.item(row).data(Qt.UserRole) for row in range(10)]
+    for task_id in task_ids:
+        with latency('drop', results):
+            drop_task(target, task_id)
+        assert window.task_items[task_id].listWidget() is target
+    allocated = peak_allocation(lambda: drop_task(source, task_ids[0]))
+    check_budget('drop', results['drop'], allocated)
+
+
+def test_scrolling(window):
+    import instrumentation
+    results = {}
+    list_widget = window.to_do_list
+    scroll_bar = list_widget.verticalScrollBar()
+    instrumentation.reset()
+
+    def scroll_step():
+        scroll_bar.setValue(scroll_bar.value() + scroll_bar.pageStep())
+        # repaint рисует видимые элементы синхронно, через PriorityDelegate.paint
+        list_widget.viewport().repaint()
+
+    scroll_bar.setValue(0)
+    scroll_step()
+    for _ in range(30):
+        with latency('scroll_frame', results):
+            scroll_step()
+    assert instrumentation.snapshot()[1].get('delegate.paint', 0) > 0
+    check_budget('scroll_frame', results['scroll_frame'], peak_allocation(scroll_step))
+
+
+def test_dialogs(window):
+    import main
+    results = {}
+    window.to_do_list.setCurrentRow(0)
+    task_id = window.to_do_list.currentItem().data(Qt.UserRole)
+
+    def open_and_close():
+        for dialog in (
+            main.UpdateTaskDialog(task_id, window),
+            main.SavedViewDialog(window.current_view, window),
+            main.PerformanceDialog(window),
+        ):
+            dialog.show()
+            QApplication.processEvents()
+            dialog.reject()
+            dialog.deleteLater()
+        QApplication.processEvents()
+
+    open_and_close()  # Первое открытие диалогов загружает стили и шрифты
+    for _ in range(5):
+        with latency('dialog', results):
+            open_and_close()
+    check_budget('dialog', results['dialog'], peak_allocation(open_and_close))
+
+
+if __name__ == '__main__':
+    raise SystemExit(pytest.main(['-q', __file__]))
@@ -0,0 +1,355 @@
+# importer.py
+#
+# Импорт задач из нескольких CSV-файлов.
+# Файлы разбираются параллельно в пуле процессов: каждая строка
+# нормализуется (дата, время, приоритет, статус), проверяется и получает
+# хэш содержимого. Затем единственный писатель в основном процессе
+# отбрасывает дубликаты по индексу хэшей task_import_keys и записывает
+# задачи большими транзакциями. Дубликатом считается и совпадение с задачей
+# в архиве (см. archive.py). Строка, чей ID уже встречался в прошлых
+# импортах, обновляет ту же задачу (upsert по внешнему ID). Внешние ID
+# действуют в пределах источника: базы, из которой сделана выгрузка
+# (колонка "База"), или имени файла. ID считается id задачи этой базы,
+# только если выгрузка сделана из неё же. Повтор ID с другим содержимым
+# в одном импорте считается ошибочной строкой.
+
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import uuid
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+import queries
+import undo
+from instrumentation import logger, timed
+
+# Сколько строк записывать одной транзакцией
+IMPORT_BATCH_SIZE = 5000
+
+# Колонки CSV в формате экспорта
+CSV_COLUMNS = {
+    'external_id': 'ID',
+    'task': 'Задача',
+    'description': 'Описание',
+    'due_date': 'Дата выполнения',
+    'due_time': 'Время выполнения',
+    'priority': 'Приоритет',
+    'status': 'Статус',
+    'completed_at': 'Завершено в',
+    'database_id': 'База',
+}
+# Заголовок выгрузки приложения (см. TaskManager.export_tasks)
+EXPORT_HEADER = list(CSV_COLUMNS.values())
+
+PRIORITY_ALIASES = {
+    'низкий': 'Низкий', 'low': 'Низкий',
+    'средний': 'Средний', 'medium': 'Средний',
+    'высокий': 'Высокий', 'high': 'Высокий',
+}
+STATUS_ALIASES = {status.casefold(): status for status in queries.STATUSES}
+STATUS_ALIASES.update({'todo': 'Сделать', 'in progress': 'В работе', 'review': 'На проверке', 'done': 'Завершено'})
+
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y')
+TIME_FORMATS = ('%H:%M', '%H:%M:%S')
+DATETIME_FORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%d.%m.%Y %H:%M')
+
+# external_id — ID с именем источника; local_id — id задачи этой базы из
+# выгрузки приложения; params — значения столбцов TASK_FIELDS; location —
+# файл и строка для сообщений об ошибках
+ParsedRow = namedtuple('ParsedRow', ('external_id', 'local_id', 'content_hash', 'params', 'location'))
+ParsedFile = namedtuple('ParsedFile', ('path', 'rows', 'errors'))
+# before — строки обновлённых задач до импорта (для журнала отмены)
+ImportResult = namedtuple('ImportResult', ('inserted', 'updated', 'duplicates', 'errors', 'before'))
+
+
+def create_import_index(conn):
+    conn.executescript(queries.CREATE_IMPORT_KEYS)
+    with conn:
+        conn.execute(queries.INSERT_DATABASE_ID, {'database_id': uuid.uuid4().hex})
+
+
+def database_id(conn):
+    """Идентификатор базы, который пишется в каждую строку выгрузки."""
+    return conn.execute(queries.SELECT_DATABASE_ID).fetchone()[0]
+
+
+def content_hash(task, description, due_date, due_time):
+    """Хэш содержимого задачи без учёта регистра и лишних пробелов."""
+    text = '\x1f'.join(' '.join((value or '').split()).casefold() for value in (task, description, due_date, due_time))
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+# Даты и время в выгрузках сильно повторяются, поэтому разбор кэшируется
+@lru_cache(maxsize=4096)
+def _parse(value, formats, output_format, label):
+    for input_format in formats:
+        try:
+            return datetime.strptime(value, input_format).strftime(output_format)
+        except ValueError:
+            pass
+    raise ValueError(f'неверное значение поля "{label}": {value}')
+
+
+def normalize_row(row, source='', database_id=None, location=''):
+    """
+    Проверяет строку CSV и возвращает ParsedRow; при ошибке бросает ValueError.
+    source — имя источника внешних ID, если в строке не указана база;
+    database_id — идентификатор этой базы: числовые ID строк, выгруженных
+    из неё, — id её задач.
+    """
+    values = {field: (row.get(column) or '').strip() for field, column in CSV_COLUMNS.items()}
+    if not values['task']:
+        raise ValueError('пустое название задачи')
+    external_id = local_id = None
+    origin = values['database_id']
+    if database_id and origin == database_id and values['external_id'].isdigit():
+        local_id = int(values['external_id'])
+    elif values['external_id']:
+        external_id = f'{origin or source}:{values["external_id"]}'
+    due_date = _parse(values['due_date'], DATE_FORMATS, '%Y-%m-%d', 'Дата выполнения') if values['due_date'] else None
+    due_time = _parse(values['due_time'], TIME_FORMATS, '%H:%M', 'Время выполнения') if values['due_time'] else None
+    priority = PRIORITY_ALIASES.get(values['priority'].casefold() or 'средний')
+    if priority is None:
+        raise ValueError(f'неизвестный приоритет: {values["priority"]}')
+    status = STATUS_ALIASES.get(values['status'].casefold() or 'сделать')
+    if status is None:
+        raise ValueError(f'неизвестный статус: {values["status"]}')
+    completed_at = None
+    if status == 'Завершено' and values['completed_at']:
+        completed_at = _parse(values['completed_at'], DATETIME_FORMATS, '%Y-%m-%d %H:%M', 'Завершено в')
+    description = values['description']
+    return ParsedRow(
+        external_id,
+        local_id,
+        content_hash(values['task'], description, due_date, due_time),
+        (values['task'], description, due_date, due_time, priority, status, completed_at),
+        location,
+    )
+
+
+def parse_file(path, database_id=None):
+    """Разбирает один CSV-файл (выполняется в процессе пула)."""
+    name = os.path.basename(path)
+    rows, errors = [], []
+    try:
+        with open(path, 'r', newline='', encoding='utf-8-sig') as csvfile:
+            reader = csv.DictReader(csvfile)
+            if CSV_COLUMNS['task'] not in (reader.fieldnames or ()):
+                return ParsedFile(path, [], [f'{name}: нет колонки "{CSV_COLUMNS["task"]}"'])
+            for row in reader:
+                location = f'{name}, строка {reader.line_num}'
+                try:
+                    rows.append(normalize_row(row, name, database_id, location))
+                except ValueError as e:
+                    errors.append(f'{location}: {e}')
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        errors.append(f'{name}: {e}')
+    return ParsedFile(path, rows, errors)
+
+
+def parse_files(paths, workers=None, database_id=None):
+    """Разбирает файлы параллельно; результаты выдаются в порядке paths."""
+    if len(paths) == 1:
+        # Запуск пула для одного файла дороже самого разбора
+        yield parse_file(paths[0], database_id)
+        return
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    # spawn, а не fork: в процессе могут работать потоки (фоновый VACUUM архива),
+    # и копия их блокировок в дочернем процессе не освободится
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        yield from executor.map(parse_file, paths, [database_id] * len(paths))
+
+
+class ImportWriter:
+    """
+    Единственный писатель импорта: копит строки и записывает их пачками
+    по batch_size, каждую пачку — одной транзакцией.
+    """
+    def __init__(self, conn, batch_size=IMPORT_BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.pending = []
+        self.hashed = False
+        # Уже известные соответствия хэш/внешний ID -> id задачи
+        self.task_by_hash = {}
+        self.task_by_external = {}
+        # Хэши задач архива и уже проверенные по архиву хэши; без
+        # подключённого архива (см. archive.attach_archive) он не проверяется
+        self.has_archive = any(row[1] == 'archive' for row in conn.execute('PRAGMA database_list'))
+        self.archived_hashes = set()
+        self.checked_archive = set()
+        # id из выгрузки приложения, проверенные и найденные в tasks
+        self.checked_local = set()
+        self.existing_local = set()
+        # ID, уже встреченные в этом импорте -> хэш содержимого
+        self.seen = {}
+        self.errors = []
+        self.inserted = []
+        self.updated = set()
+        self.duplicates = 0
+        self.before = {}
+
+    def add(self, rows):
+        self.pending.extend(rows)
+        while len(self.pending) >= self.batch_size:
+            batch = self.pending[:self.batch_size]
+            del self.pending[:self.batch_size]
+            self._write(batch)
+
+    def finish(self, errors=()):
+        if self.pending:
+            self._write(self.pending)
+            self.pending = []
+        return ImportResult(self.inserted, sorted(self.updated), self.duplicates, list(errors) + self.errors, self.before)
+
+    def _hash_existing(self):
+        # Индекс хэшей догоняет задачи, созданные или изменённые после прошлого импорта
+        rows = self.conn.execute(queries.SELECT_UNHASHED_TASKS).fetchall()
+        self.conn.executemany(queries.UPSERT_IMPORT_HASH, (
+            {'task_id': row[0], 'content_hash': content_hash(*row[1:])} for row in rows
+        ))
+        if self.has_archive:
+            rows = self.conn.execute(queries.SELECT_UNHASHED_ARCHIVED_TASKS).fetchall()
+            self.conn.executemany(queries.UPSERT_ARCHIVED_IMPORT_HASH, (
+                {'task_id': row[0], 'content_hash': content_hash(*row[1:])} for row in rows
+            ))
+        self.hashed = True
+
+    def _lookup(self, batch):
+        hashes = {row.content_hash for row in batch} - self.task_by_hash.keys()
+        external_ids = {row.external_id for row in batch if row.external_id} - self.task_by_external.keys()
+        if hashes:
+            self.task_by_hash.update(self.conn.execute(
+                queries.SELECT_TASKS_BY_HASHES, {'hashes': json.dumps(list(hashes))}
+            ).fetchall())
+        hashes -= self.task_by_hash.keys() | self.checked_archive
+        if hashes and self.has_archive:
+            self.archived_hashes.update(row[0] for row in self.conn.execute(
+                queries.SELECT_ARCHIVED_HASHES, {'hashes': json.dumps(list(hashes))}
+            ))
+            self.checked_archive |= hashes
+        if external_ids:
+            self.task_by_external.update(self.conn.execute(
+                queries.SELECT_TASKS_BY_EXTERNAL_IDS, {'external_ids': json.dumps(list(external_ids), ensure_ascii=False)}
+            ).fetchall())
+        local_ids = {row.local_id for row in batch if row.local_id is not None} - self.checked_local
+        if local_ids:
+            self.existing_local.update(row[0] for row in self.conn.execute(
+                queries.SELECT_EXISTING_TASK_IDS, {'ids': queries.ids_param(local_ids)}
+            ))
+            self.checked_local |= local_ids
+
+    def _write(self, batch):
+        with timed('import.write'):
+            with self.conn:
+                # Блокируем запись сразу, чтобы новые id принадлежали только этому импорту
+                self.conn.execute('BEGIN IMMEDIATE')
+                if not self.hashed:
+                    self._hash_existing()
+                self._lookup(batch)
+
+                new_rows, new_by_hash = [], {}
+                updates, links = {}, {}
+                for row in batch:
+                    key = row.external_id or row.local_id
+                    if key is not None:
+                        if key in self.seen:
+                            # Тот же ID в этом импорте: повтор или конфликт содержимого
+                            if self.seen[key] == row.content_hash:
+                                self.duplicates += 1
+                            else:
+                                self.errors.append(f'{row.location}: ID уже встречался в импорте с другим содержимым')
+                            continue
+                        self.seen[key] = row.content_hash
+                    if row.external_id:
+                        task_id = self.task_by_external.get(row.external_id)
+                    else:
+                        task_id = row.local_id if row.local_id in self.existing_local else None
+                    if task_id is not None:
+                        updates[task_id] = row
+                    elif row.content_hash in self.task_by_hash:
+                        self.duplicates += 1
+                        if row.external_id:
+                            # Дубликат с ID запоминается, чтобы следующий импорт обновил эту задачу
+                            links[self.task_by_hash[row.content_hash]] = row.external_id
+                            self.task_by_external[row.external_id] = self.task_by_hash[row.content_hash]
+                    elif row.content_hash in self.archived_hashes:
+                        self.duplicates += 1
+                    elif row.content_hash in new_by_hash:
+                        self.duplicates += 1
+                        index = new_by_hash[row.content_hash]
+                        if row.external_id and new_rows[index].external_id is None:
+                            new_rows[index] = new_rows[index]._replace(external_id=row.external_id)
+                    else:
+                        new_by_hash[row.content_hash] = len(new_rows)
+                        new_rows.append(row)
+
+                self._update(updates)
+                if links:
+                    self.conn.executemany(queries.LINK_EXTERNAL_ID, (
+                        {'task_id': task_id, 'external_id': external_id} for task_id, external_id in links.items()
+                    ))
+                self._insert(new_rows)
+
+    def _update(self, updates):
+        if not updates:
+            return
+        before = undo.fetch_rows(self.conn, updates)
+        changed = {}
+        for task_id, row in updates.items():
+            if task_id not in before:
+                continue
+            if before[task_id][:len(queries.TASK_FIELDS)] == row.params:
+                self.duplicates += 1
+            else:
+                changed[task_id] = row
+                self.before.setdefault(task_id, before[task_id])
+        self.conn.executemany(queries.UPDATE_TASK, (
+            dict(zip(queries.TASK_FIELDS, row.params), id=task_id) for task_id, row in changed.items()
+        ))
+        # Триггер сбросил хэши изменённых задач — записываем новые
+        self.conn.executemany(queries.UPSERT_IMPORT_HASH, (
+            {'task_id': task_id, 'content_hash': row.content_hash} for task_id, row in changed.items()
+        ))
+        for task_id, row in changed.items():
+            self.task_by_hash[row.content_hash] = task_id
+        self.updated.update(changed)
+
+    def _insert(self, new_rows):
+        if not new_rows:
+            return
+        last_id = self.conn.execute(queries.SELECT_MAX_TASK_ID).fetchone()[0]
+        self.conn.executemany(queries.INSERT_TASK, (dict(zip(queries.TASK_FIELDS, row.params)) for row in new_rows))
+        # Под блокировкой записи новые id идут подряд в порядке вставки
+        task_ids = [row[0] for row in self.conn.execute(queries.SELECT_TASK_IDS_AFTER_ID, {'id': last_id})]
+        self.conn.executemany(queries.INSERT_IMPORT_KEY, (
+            {'task_id': task_id, 'content_hash': row.content_hash, 'external_id': row.external_id}
+            for task_id, row in zip(task_ids, new_rows)
+        ))
+        for task_id, row in zip(task_ids, new_rows):
+            self.task_by_hash[row.content_hash] = task_id
+            if row.external_id:
+                self.task_by_external[row.external_id] = task_id
+        self.inserted.extend(task_ids)
+
+
+def import_files(conn, paths, workers=None, batch_size=IMPORT_BATCH_SIZE):
+    """Импортирует задачи из файлов paths. Возвращает ImportResult."""
+    writer = ImportWriter(conn, batch_size)
+    errors = []
+    with timed('import.files'):
+        for parsed in parse_files(paths, workers, database_id(conn)):
+            errors.extend(parsed.errors)
+            writer.add(parsed.rows)
+        result = writer.finish(errors)
+    logger.info(
+        'Импорт %d файлов: добавлено %d, обновлено %d, дубликатов %d, ошибок %d',
+        len(paths), len(result.inserted), len(result.updated), result.duplicates, len(result.errors)
+    )
+    return result
@@ -0,0 +1,114 @@
+# instrumentation.py
+#
+# Лёгкие счётчики и таймеры для горячих путей приложения.
+# Все замеры хранятся в памяти (последние SAMPLE_LIMIT значений на метрику)
+# и дублируются в logging на уровне DEBUG.
+
+import cProfile
+import logging
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+from queries import STATEMENT_NAMES
+
+logger = logging.getLogger('task_manager')
+
+# Сколько последних замеров хранить для каждой метрики
+SAMPLE_LIMIT = 1000
+
+_timings = {}
+_counters = {}
+_profiler = None
+
+
+def record(name, seconds):
+    """Сохраняет длительность операции name в секундах."""
+    samples = _timings.get(name)
+    if samples is None:
+        samples = _timings[name] = deque(maxlen=SAMPLE_LIMIT)
+    samples.append(seconds)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('%s: %.2f мс', name, seconds * 1000)
+
+
+def count(name, amount=1):
+    """Увеличивает счётчик name."""
+    _counters[name] = _counters.get(name, 0) + amount
+
+
+@contextmanager
+def timed(name):
+    """Контекстный менеджер для замера длительности блока кода."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def snapshot():
+    """
+    Возвращает список (имя, число замеров, p50, p95, max) в миллисекундах
+    и словарь счётчиков.
+    """
+    rows = []
+    # Замеры могут добавляться из других потоков (API, фоновый VACUUM)
+    for name, samples in list(_timings.items()):
+        if not samples:
+            continue
+        values = sorted(samples)
+        rows.append((
+            name,
+            len(values),
+            _percentile(values, 0.5) * 1000,
+            _percentile(values, 0.95) * 1000,
+            values[-1] * 1000,
+        ))
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows, dict(_counters)
+
+
+def reset():
+    _timings.clear()
+    _counters.clear()
+
+
+@lru_cache(maxsize=256)
+def sql_label(sql):
+    # Запросы из queries.py называются по имени константы, остальные — полным
+    # текстом без лишних пробелов: усечение склеивало бы разные запросы
+    name = STATEMENT_NAMES.get(sql)
+    if name is not None:
+        return f'sql: {name}'
+    return 'sql: ' + re.sub(r'\s+', ' ', sql).strip()
+
+
+def is_profiling():
+    return _profiler is not None
+
+
+def start_profiling():
+    """Включает cProfile для всего процесса."""
+    global _profiler
+    if _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+        logger.info('Профилирование запущено')
+
+
+def stop_profiling(file_name):
+    """Останавливает cProfile и сохраняет статистику в файл (формат pstats)."""
+    global _profiler
+    if _profiler is None:
+        return
+    _profiler.disable()
+    _profiler.dump_stats(file_name)
+    _profiler = None
+    logger.info('Профиль сохранён в %s', file_name)
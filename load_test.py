@@ -0,0 +1,125 @@
+# load_test.py
+#
+# Нагрузочный тест для api_server.py.
+# Сначала запустите сервер на отдельной копии базы:
+#     python api_server.py --db load_test.db
+# затем:
+#     python load_test.py --clients 32 --duration 10
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import quote
+
+STATUSES = ['Сделать', 'В работе', 'На проверке', 'Завершено']
+PRIORITIES = ['Низкий', 'Средний', 'Высокий']
+
+
+class Client:
+    """HTTP/1.1 клиент с одним keep-alive соединением."""
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, body=None, headers=None):
+        payload = b'' if body is None else json.dumps(body, ensure_ascii=False).encode('utf-8')
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}', f'Content-Length: {len(payload)}']
+        for name, value in (headers or {}).items():
+            lines.append(f'{name}: {value}')
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + payload)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        length = int(response_headers.get('content-length', 0))
+        data = await self.reader.readexactly(length) if length else b''
+        return status, response_headers, (json.loads(data) if data else None)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def worker(host, port, deadline, write_ratio, latencies, errors):
+    client = Client(host, port)
+    await client.connect()
+    etag = None
+    created = []
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            roll = random.random()
+            if roll < write_ratio / 2 or not created:
+                status, _, body = await client.request('POST', '/tasks', {
+                    'task': f'Нагрузка {random.randint(0, 10 ** 6)}',
+                    'priority': random.choice(PRIORITIES),
+                    'due_date': '2030-01-01',
+                    'due_time': '12:00',
+                })
+                kind = 'create'
+                if status == 201:
+                    created.append(body['id'])
+            elif roll < write_ratio:
+                task_id = random.choice(created)
+                status, _, _ = await client.request('POST', f'/tasks/{task_id}/move', {'status': random.choice(STATUSES)})
+                kind = 'move'
+            elif roll < write_ratio + (1 - write_ratio) / 2:
+                headers = {'If-None-Match': etag} if etag else None
+                status, response_headers, _ = await client.request('GET', '/tasks?status=' + quote('Сделать'), headers=headers)
+                etag = response_headers.get('etag', etag)
+                kind = 'list'
+            else:
+                status, _, _ = await client.request('GET', '/tasks/search?q=' + str(random.randint(0, 9)))
+                kind = 'search'
+            latencies.setdefault(kind, []).append(time.perf_counter() - start)
+            if status >= 400:
+                errors[kind] = errors.get(kind, 0) + 1
+    finally:
+        for task_id in created:
+            await client.request('DELETE', f'/tasks/{task_id}')
+        client.close()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def main(host, port, clients, duration, write_ratio):
+    latencies, errors = {}, {}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(worker(host, port, deadline, write_ratio, latencies, errors) for _ in range(clients)))
+
+    total = sum(len(values) for values in latencies.values())
+    print(f'Запросов: {total}, {total / duration:.0f} в секунду')
+    for kind, values in sorted(latencies.items()):
+        print(
+            f'{kind:>7}: {len(values):6d}  '
+            f'p50 {percentile(values, 0.5) * 1000:7.2f} мс  '
+            f'p95 {percentile(values, 0.95) * 1000:7.2f} мс  '
+            f'ошибок {errors.get(kind, 0)}'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Нагрузочный тест локального API задач.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='Доля запросов на запись')
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port, args.clients, args.duration, args.write_ratio))
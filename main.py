@@ -6,6 +6,9 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 import sys
 import csv
 import os
+import html
+import logging
+import multiprocessing
 from PyQt5.QtCore import QSize, QDate, QTime, Qt, QTimer, pyqtSignal, QMimeData, QByteArray
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
@@ -14,26 +17,63 @@ from PyQt5.QtWidgets import (
     QDialogButtonBox, QComboBox, QTextEdit, QFileDialog, QMenuBar, QAction,
     QGroupBox, QRadioButton, QButtonGroup, QSplitter, QToolBar,
     QMenu, QStyle, QStyledItemDelegate, QStyleOptionViewItem, QStylePainter,
+    QTableWidget, QTableWidgetItem, QHeaderView, QCheckBox, QToolButton,
 )
-from PyQt5.QtGui import QColor, QDrag, QFont, QIcon, QPixmap, QKeySequence
-from database import create_connection, create_table
+from PyQt5.QtGui import QColor, QDrag, QFont, QIcon, QPixmap, QKeySequence, QTextDocument
+from database import get_connection, create_table, ChangeWatcher
+import queries
+import undo
+import archive
+import search
+import views
+import importer
+import recurrence
+import instrumentation
+from instrumentation import logger, timed
+
+# Интервал опроса базы на изменения от других процессов (мс)
+SYNC_INTERVAL = 1000
+# При большем числе изменённых задач список перечитывается целиком
+SYNC_BATCH_LIMIT = 500
+# Архивация: первый запуск после старта, обычный интервал и пауза между пачками (мс)
+ARCHIVE_START_DELAY = 5000
+ARCHIVE_INTERVAL = 10 * 60 * 1000
+ARCHIVE_BUSY_INTERVAL = 200
+# Сколько архивных задач подгружать за раз при прокрутке
+ARCHIVE_PAGE_SIZE = 200
+# Сколько найденных задач показывать сразу и подгружать при прокрутке
+SEARCH_PAGE_SIZE = 500
+# Поиск запускается после паузы в наборе (мс), а не на каждую клавишу
+SEARCH_DEBOUNCE = 200
+# Максимальная ширина свёрнутой колонки (у развёрнутой ограничения нет)
+COLLAPSED_COLUMN_WIDTH = 40
+UNLIMITED_WIDTH = 16777215
 
 class PriorityDelegate(QStyledItemDelegate):
     """
     Делегат для отображения иконок приоритета в списке задач.
     """
+    ICON_FILES = {
+        'Высокий': 'icons/high_priority.png',
+        'Средний': 'icons/medium_priority.png',
+        'Низкий': 'icons/low_priority.png',
+    }
+    # Иконки загружаются один раз: чтение файла на каждую отрисовку тормозит прокрутку
+    icons = {}
+
+    def priority_icon(self, priority):
+        icon = self.icons.get(priority)
+        if icon is None:
+            icon = QIcon(self.ICON_FILES[priority]) if priority in self.ICON_FILES else QIcon()
+            self.icons[priority] = icon
+        return icon
+
     def paint(self, painter, option, index):
+        instrumentation.count('delegate.paint')
         priority = index.data(Qt.UserRole + 1)  # Получаем приоритет напрямую из данных
 
         # Определение иконки в зависимости от приоритета
-        if priority == 'Высокий':
-            icon = QIcon('icons/high_priority.png')
-        elif priority == 'Средний':
-            icon = QIcon('icons/medium_priority.png')
-        elif priority == 'Низкий':
-            icon = QIcon('icons/low_priority.png')
-        else:
-            icon = QIcon()
+        icon = self.priority_icon(priority)
 
         # Отрисовка иконки
         if not icon.isNull():
@@ -41,7 +81,45 @@ class PriorityDelegate(QStyledItemDelegate):
 
         # Смещение текста, чтобы не перекрывать иконку
         option.rect.setLeft(option.rect.left() + 30)
-        super().paint(painter, option, index)
+
+        # Совпадения с поисковым запросом считаются только для видимых элементов
+        query = index.data(Qt.UserRole + 3)
+        spans = search.highlight_spans(query, index.data(Qt.DisplayRole)) if query else None
+        if spans:
+            self.paint_highlighted(painter, option, index, spans)
+        else:
+            super().paint(painter, option, index)
+
+    def paint_highlighted(self, painter, option, index, spans):
+        # Фон и выделение рисует стиль, текст — QTextDocument с подсветкой совпадений
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        text = opt.text
+        opt.text = ''
+        style = opt.widget.style() if opt.widget else QApplication.style()
+        style.drawControl(QStyle.CE_ItemViewItem, opt, painter, opt.widget)
+
+        parts = []
+        position = 0
+        for start, end in spans:
+            parts.append(html.escape(text[position:start]))
+            parts.append(f'<span style="background-color: #5e81ac; color: #eceff4;">{html.escape(text[start:end])}</span>')
+            position = end
+        parts.append(html.escape(text[position:]))
+
+        document = QTextDocument()
+        document.setDefaultFont(opt.font)
+        document.setDocumentMargin(0)
+        color = index.data(Qt.ForegroundRole)
+        color = color.color().name() if color is not None else '#d8dee9'
+        document.setHtml(f'<span style="color: {color};">{"".join(parts)}</span>')
+
+        text_rect = style.subElementRect(QStyle.SE_ItemViewItemText, opt, opt.widget)
+        painter.save()
+        painter.translate(text_rect.left(), text_rect.top() + (text_rect.height() - document.size().height()) / 2)
+        painter.setClipRect(0, 0, text_rect.width(), text_rect.height())
+        document.drawContents(painter)
+        painter.restore()
 
 class DraggableListWidget(QListWidget):
     taskDropped = pyqtSignal(int, str)  # Сигнал: task_id, new_status
@@ -53,6 +131,8 @@ class DraggableListWidget(QListWidget):
         self.setDragEnabled(True)
         self.setDropIndicatorShown(True)
         self.setSelectionMode(QListWidget.SingleSelection)
+        # Все элементы одной высоты: раскладка не измеряет каждый из тысяч элементов
+        self.setUniformItemSizes(True)
         self.setObjectName(status)
         self.init_style()
         self.setItemDelegate(PriorityDelegate())  # Установка делегата для отображения иконок приоритета
@@ -108,7 +188,7 @@ class DraggableListWidget(QListWidget):
             try:
                 task_id = int(task_id_bytes.data().decode('utf-8'))
                 new_status = self.status
-                print(f'Dropped task_id: {task_id} to status: {new_status}')  # Отладка
+                logger.debug('Dropped task_id: %s to status: %s', task_id, new_status)
                 self.taskDropped.emit(task_id, new_status)
                 event.accept()
             except (IndexError, ValueError) as e:
@@ -127,17 +207,61 @@ class DraggableListWidget(QListWidget):
             delete_action = QAction('Удалить', self)
             menu.addAction(update_action)
             menu.addAction(delete_action)
+            series_id = self.window().series_of_item(item)
+            stop_action = None
+            if series_id is not None:
+                stop_action = QAction('Остановить повторение', self)
+                menu.addAction(stop_action)
             action = menu.exec_(self.mapToGlobal(event.pos()))
             if action == update_action:
                 self.parent().update_task()
             elif action == delete_action:
                 self.parent().delete_task()
+            elif action is not None and action == stop_action:
+                self.window().stop_recurrence(series_id)
+
+class ArchiveListWidget(DraggableListWidget):
+    """
+    Список архивных задач: только просмотр, без перетаскивания.
+    """
+    def __init__(self, parent=None):
+        super().__init__('Архив', parent)
+        self.setAcceptDrops(False)
+        self.setDragEnabled(False)
+
+    def contextMenuEvent(self, event):
+        item = self.itemAt(event.pos())
+        if item:
+            menu = QMenu(self)
+            restore_action = QAction('Вернуть в работу', self)
+            menu.addAction(restore_action)
+            if menu.exec_(self.mapToGlobal(event.pos())) == restore_action:
+                self.window().restore_archived_task(item)
 
 class TaskManager(QWidget):
     def __init__(self):
         super().__init__()
         try:
             create_table()
+            archive.attach_archive(get_connection())
+            # Разовый полный VACUUM для incremental_vacuum — в фоне, не в потоке интерфейса
+            archive.start_conversion()
+            # Экземпляры повторяющихся задач на сегодня появляются до первой загрузки доски
+            self.materialize_recurring()
+            self.change_watcher = ChangeWatcher()
+            self.task_items = {}
+            # Текущий нечёткий запрос, оценки показанных задач и ещё не
+            # прочитанные результаты (пусто — поиск через LIKE)
+            self.fuzzy_text = ''
+            self.search_scores = {}
+            self.search_results = None
+            # Активный сохранённый вид и кэш его результатов
+            self.current_view = None
+            self.view_cache = views.ViewCache()
+            # Свёрнутые колонки не заполняются, пока их не развернут
+            self.collapsed_statuses = set()
+            self.column_headers = {}
+            self.undo_stack = undo.UndoStack()
             self.initUI()
             self.initTimer()
         except Exception as e:
@@ -260,6 +384,31 @@ class TaskManager(QWidget):
         import_action.triggered.connect(self.import_tasks)
         toolbar.addAction(import_action)
 
+        self.undo_action = QAction("Отменить", self)
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.undo_action.triggered.connect(self.undo_last)
+        toolbar.addAction(self.undo_action)
+
+        self.redo_action = QAction("Повторить", self)
+        self.redo_action.setShortcuts([QKeySequence.Redo, QKeySequence("Ctrl+Y")])
+        self.redo_action.triggered.connect(self.redo_last)
+        toolbar.addAction(self.redo_action)
+        self.update_undo_actions()
+
+        self.archive_action = QAction("Архив", self)
+        self.archive_action.setCheckable(True)
+        self.archive_action.setShortcut(QKeySequence("Ctrl+Shift+A"))
+        self.archive_action.setToolTip("Показать/скрыть архив завершённых задач (Ctrl+Shift+A)")
+        self.archive_action.toggled.connect(self.toggle_archive)
+        toolbar.addAction(self.archive_action)
+
+        performance_action = QAction("Производительность", self)
+        performance_action.setShortcut(QKeySequence("Ctrl+Shift+P"))
+        performance_action.setToolTip("Показать/скрыть статистику производительности (Ctrl+Shift+P)")
+        performance_action.triggered.connect(self.toggle_performance_dialog)
+        toolbar.addAction(performance_action)
+        self.performance_dialog = None
+
         # Основные макеты
         main_layout = QVBoxLayout()
         main_layout.setMenuBar(toolbar)
@@ -276,18 +425,36 @@ class TaskManager(QWidget):
         self.in_progress_list = DraggableListWidget('В работе', self)
         self.under_review_list = DraggableListWidget('На проверке', self)
         self.done_list = DraggableListWidget('Завершено', self)
+        self.status_lists = {
+            'Сделать': self.to_do_list,
+            'В работе': self.in_progress_list,
+            'На проверке': self.under_review_list,
+            'Завершено': self.done_list,
+        }
 
         # Подключение сигналов для обновления статуса
         self.to_do_list.taskDropped.connect(self.update_task_status)
         self.in_progress_list.taskDropped.connect(self.update_task_status)
         self.under_review_list.taskDropped.connect(self.update_task_status)
         self.done_list.taskDropped.connect(self.update_task_status)
+        for list_widget in self.status_lists.values():
+            list_widget.verticalScrollBar().valueChanged.connect(self.on_task_list_scrolled)
 
         # Добавление списков в макет
-        lists_layout.addWidget(self.create_list_widget('Сделать', self.to_do_list))
-        lists_layout.addWidget(self.create_list_widget('В работе', self.in_progress_list))
-        lists_layout.addWidget(self.create_list_widget('На проверке', self.under_review_list))
-        lists_layout.addWidget(self.create_list_widget('Завершено', self.done_list))
+        lists_layout.addWidget(self.create_list_widget('Сделать', self.to_do_list, collapsible=True))
+        lists_layout.addWidget(self.create_list_widget('В работе', self.in_progress_list, collapsible=True))
+        lists_layout.addWidget(self.create_list_widget('На проверке', self.under_review_list, collapsible=True))
+        lists_layout.addWidget(self.create_list_widget('Завершено', self.done_list, collapsible=True))
+
+        # Архив скрыт по умолчанию и читается только при открытии
+        self.archive_list = ArchiveListWidget(self)
+        self.archive_list.itemClicked.connect(self.display_archived_description)
+        self.archive_list.verticalScrollBar().valueChanged.connect(self.on_archive_scrolled)
+        self.archive_container = self.create_list_widget('Архив', self.archive_list)
+        self.archive_container.setVisible(False)
+        self.archive_last_key = None
+        self.archive_exhausted = True
+        lists_layout.addWidget(self.archive_container)
 
         lists_widget.setLayout(lists_layout)
         splitter.addWidget(lists_widget)
@@ -300,7 +467,12 @@ class TaskManager(QWidget):
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText('Поиск задач...')
-        self.search_input.textChanged.connect(self.search_tasks)
+        # Таймер перезапускается каждой клавишей; доска перечитывается один раз
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE)
+        self.search_timer.timeout.connect(self.search_tasks)
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
         search_label = QLabel('Поиск:')
         search_layout.addWidget(search_label)
         search_layout.addWidget(self.search_input)
@@ -348,6 +520,12 @@ class TaskManager(QWidget):
         self.time_edit.setTime(QTime.currentTime())
         form_layout.addRow('Время выполнения:', self.time_edit)
 
+        self.repeat_combo = QComboBox()
+        for label, rule in recurrence.REPEAT_PRESETS.items():
+            self.repeat_combo.addItem(label, rule)
+        self.repeat_combo.setToolTip('Повторяющаяся задача: следующий экземпляр появится после завершения текущего')
+        form_layout.addRow('Повтор:', self.repeat_combo)
+
         details_layout.addLayout(form_layout)
 
         # Кнопки добавления, обновления и удаления
@@ -390,6 +568,21 @@ class TaskManager(QWidget):
         filter_layout.addWidget(self.filter_combo)
         details_layout.addLayout(filter_layout)
 
+        # Сохранённые виды
+        view_layout = QHBoxLayout()
+        self.view_combo = QComboBox()
+        self.view_combo.currentIndexChanged.connect(self.select_view)
+        view_layout.addWidget(QLabel('Вид:'))
+        view_layout.addWidget(self.view_combo, 1)
+        save_view_button = QPushButton('Сохранить вид...')
+        save_view_button.clicked.connect(self.save_view)
+        view_layout.addWidget(save_view_button)
+        self.delete_view_button = QPushButton('Удалить вид')
+        self.delete_view_button.clicked.connect(self.delete_view)
+        view_layout.addWidget(self.delete_view_button)
+        details_layout.addLayout(view_layout)
+        self.reload_view_combo()
+
         details_widget.setLayout(details_layout)
         splitter.addWidget(details_widget)
 
@@ -410,7 +603,7 @@ class TaskManager(QWidget):
 
         self.load_tasks()
 
-    def create_list_widget(self, title, list_widget):
+    def create_list_widget(self, title, list_widget, collapsible=False):
         layout = QVBoxLayout()
         label = QLabel(title)
         label.setAlignment(Qt.AlignCenter)
@@ -418,82 +611,325 @@ class TaskManager(QWidget):
         font.setBold(True)
         font.setPointSize(12)
         label.setFont(font)
-        layout.addWidget(label)
-        layout.addWidget(list_widget)
         container = QWidget()
+        if collapsible:
+            # Заголовок колонки: кнопка сворачивания, название с числом задач
+            # и разбивка по приоритетам
+            header_layout = QHBoxLayout()
+            toggle_button = QToolButton()
+            toggle_button.setArrowType(Qt.DownArrow)
+            toggle_button.setToolTip('Свернуть колонку')
+            toggle_button.clicked.connect(lambda: self.toggle_column(title))
+            header_layout.addWidget(toggle_button)
+            header_layout.addWidget(label, 1)
+            layout.addLayout(header_layout)
+            counts_label = QLabel()
+            counts_label.setAlignment(Qt.AlignCenter)
+            layout.addWidget(counts_label)
+            self.column_headers[title] = (container, label, counts_label, toggle_button)
+        else:
+            layout.addWidget(label)
+        layout.addWidget(list_widget)
         container.setLayout(layout)
         return container
 
+    def expanded_statuses(self):
+        return [status for status in queries.STATUSES if status not in self.collapsed_statuses]
+
+    def toggle_column(self, status):
+        container, label, counts_label, toggle_button = self.column_headers[status]
+        list_widget = self.status_lists[status]
+        if status in self.collapsed_statuses:
+            self.collapsed_statuses.discard(status)
+            list_widget.setVisible(True)
+            counts_label.setVisible(True)
+            label.setVisible(True)
+            container.setMaximumWidth(UNLIMITED_WIDTH)
+            toggle_button.setArrowType(Qt.DownArrow)
+            toggle_button.setToolTip('Свернуть колонку')
+            self.populate_column(status)
+        else:
+            # Свёрнутая колонка освобождает свои элементы целиком
+            self.collapsed_statuses.add(status)
+            for row in range(list_widget.count()):
+                self.task_items.pop(list_widget.item(row).data(Qt.UserRole), None)
+            list_widget.clear()
+            list_widget.setVisible(False)
+            counts_label.setVisible(False)
+            label.setVisible(False)
+            container.setMaximumWidth(COLLAPSED_COLUMN_WIDTH)
+            toggle_button.setArrowType(Qt.RightArrow)
+            self.update_column_counts()
+
+    def populate_column(self, status):
+        # Заполнение одной развёрнутой колонки без перезагрузки остальных
+        if self.fuzzy_text:
+            # Найденные задачи читаются страницами сразу для всех колонок
+            self.load_tasks(filter_text=self.fuzzy_text, priority_filter=self.filter_combo.currentText())
+            return
+        list_widget = self.status_lists[status]
+        try:
+            with timed('load_tasks.column'):
+                conn = get_connection()
+                query, params = queries.load_tasks_query(
+                    self.search_input.text().strip(), self.filter_combo.currentText(), [status]
+                )
+                tasks = conn.execute(query, params).fetchall()
+                list_widget.clear()
+                for task in tasks:
+                    item = self.create_task_item(task)
+                    list_widget.addItem(item)
+                    self.task_items[task[0]] = item
+        except Exception as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось загрузить колонку.\n{e}')
+            return
+        self.apply_view()
+        self.update_column_counts()
+
+    def update_column_counts(self):
+        # Счётчики берутся из таблицы task_counts: несколько строк вместо COUNT(*) по задачам
+        try:
+            rows = get_connection().execute(queries.SELECT_TASK_COUNTS).fetchall()
+        except Exception as e:
+            logger.error('Ошибка загрузки счётчиков задач: %s', e)
+            return
+        totals = {status: {} for status in queries.STATUSES}
+        for status, priority, count in rows:
+            if status in totals:
+                totals[status][priority] = count
+        for status, (container, label, counts_label, toggle_button) in self.column_headers.items():
+            by_priority = totals[status]
+            total = sum(by_priority.values())
+            label.setText(f'{status} ({total})')
+            counts_label.setText(' · '.join(
+                f'{priority}: {by_priority.get(priority, 0)}' for priority in ('Высокий', 'Средний', 'Низкий')
+            ))
+            toggle_button.setToolTip(
+                'Свернуть колонку' if status not in self.collapsed_statuses else f'Развернуть «{status}» ({total})'
+            )
+
     def load_tasks(self, filter_text='', priority_filter='Все'):
+        # Очистка списков сдвигает полосы прокрутки: старые результаты поиска не подгружаем
+        self.search_results = None
         # Очистка всех списков
         self.to_do_list.clear()
         self.in_progress_list.clear()
         self.under_review_list.clear()
         self.done_list.clear()
+        self.task_items = {}
 
         try:
-            conn = create_connection()
-            cursor = conn.cursor()
-            query = '''
-                SELECT id, task, description, due_date, due_time, priority, status, completed_at FROM tasks
-                WHERE (task LIKE ? OR description LIKE ?)
-            '''
-            params = (f'%{filter_text}%', f'%{filter_text}%')
-            if priority_filter != 'Все':
-                query += ' AND priority = ?'
-                params += (priority_filter,)
-            query += ' ORDER BY due_date, due_time'
-            cursor.execute(query, params)
-            tasks = cursor.fetchall()
-            conn.close()
+            with timed('load_tasks.query'):
+                # Всё, что изменится после этого момента, будет подхвачено синхронизацией
+                self.change_watcher.mark_synced()
+                conn = get_connection()
+                if filter_text and search.is_fuzzy_query(filter_text) and search.is_available(conn):
+                    # Нечёткий поиск: результаты упорядочены по похожести
+                    self.fuzzy_text = filter_text
+                    self.search_scores = {}
+                    self.search_results = search.SearchResults(filter_text)
+                    tasks = self.fetch_search_page(conn, priority_filter)
+                else:
+                    self.fuzzy_text = ''
+                    self.search_scores = {}
+                    query, params = queries.load_tasks_query(filter_text, priority_filter, self.expanded_statuses())
+                    tasks = conn.execute(query, params).fetchall()
         except Exception as e:
             QMessageBox.critical(self, 'Ошибка', f'Не удалось загрузить задачи.\n{e}')
             return
 
-        for task in tasks:
-            task_id, task_text, description, due_date, due_time, priority, status, completed_at = task
-            if status == 'Завершено' and completed_at:
-                # Если задача завершена, добавляем время завершения
-                display_text = f'{task_text} (Завершено: {completed_at})'
-            else:
-                if due_date and due_time:
-                    display_text = f'{task_text} (До {due_date} {due_time})'
-                elif due_date:
-                    display_text = f'{task_text} (До {due_date})'
-                elif due_time:
-                    display_text = f'{task_text} (До {due_time})'
-                else:
-                    display_text = f'{task_text}'
-
-            item = QListWidgetItem(display_text)
-            # Установка цвета фона в зависимости от приоритета
-            if priority == 'Высокий':
-                item.setBackground(QColor('#bf616a'))  # Красный
-                item.setForeground(QColor('#2e3440'))
-            elif priority == 'Средний':
-                item.setBackground(QColor('#ebcb8b'))  # Желтый
-                item.setForeground(QColor('#2e3440'))
-            elif priority == 'Низкий':
-                item.setBackground(QColor('#a3be8c'))  # Зеленый
-                item.setForeground(QColor('#2e3440'))
-
-            # Добавление описания как подсказки
-            if description:
-                item.setToolTip(description)
-
-            # Сохранение task_id и priority в данных элемента
-            item.setData(Qt.UserRole, task_id)
-            item.setData(Qt.UserRole + 1, priority)
+        with timed('load_tasks.build_items'):
+            items = []
+            for task in tasks:
+                list_widget = self.status_lists.get(task[6])
+                if list_widget is not None:
+                    items.append((task[0], list_widget, self.create_task_item(task)))
 
+        with timed('load_tasks.insert'):
             # Добавление в соответствующий список
-            if status == 'Сделать':
-                self.to_do_list.addItem(item)
-            elif status == 'В работе':
-                self.in_progress_list.addItem(item)
-            elif status == 'На проверке':
-                self.under_review_list.addItem(item)
-            elif status == 'Завершено':
-                self.done_list.addItem(item)
+            for task_id, list_widget, item in items:
+                list_widget.addItem(item)
+                self.task_items[task_id] = item
+        instrumentation.count('load_tasks.rows', len(items))
+        self.apply_view()
+        self.update_column_counts()
+
+        if self.archive_action.isChecked():
+            self.reset_archive_list()
+
+    def fetch_search_page(self, conn, priority_filter):
+        # Результаты читаются, пока не наберётся страница показываемых задач:
+        # часть найденных может не пройти фильтр приоритета или быть в свёрнутой колонке
+        tasks = []
+        while len(tasks) < SEARCH_PAGE_SIZE and not self.search_results.exhausted:
+            scores = {
+                task_id: score for task_id, score in self.search_results.next_page(conn, SEARCH_PAGE_SIZE)
+                # Изменённые задачи могли попасть на доску раньше своей страницы
+                if task_id not in self.task_items
+            }
+            self.search_scores.update(scores)
+            query, params = queries.tasks_by_ids_query(scores, priority_filter)
+            tasks += [
+                task for task in conn.execute(query, params).fetchall()
+                if task[6] not in self.collapsed_statuses
+            ]
+        tasks.sort(key=lambda task: (-self.search_scores[task[0]], task[0]))
+        return tasks
+
+    def load_search_page(self):
+        if self.search_results is None or self.search_results.exhausted:
+            return
+        try:
+            with timed('load_tasks.search_page'):
+                tasks = self.fetch_search_page(get_connection(), self.filter_combo.currentText())
+                for task in tasks:
+                    list_widget = self.status_lists.get(task[6])
+                    if list_widget is not None:
+                        item = self.create_task_item(task)
+                        self.insert_task_item(list_widget, item)
+                        self.task_items[task[0]] = item
+        except Exception as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось загрузить результаты поиска.\n{e}')
+            return
+        self.apply_view()
+
+    def on_task_list_scrolled(self, value):
+        # Следующая страница результатов поиска подгружается при прокрутке любой колонки до конца
+        if self.search_results is not None and value == self.sender().maximum():
+            self.load_search_page()
+
+    def create_task_item(self, task):
+        task_id, task_text, description, due_date, due_time, priority, status, completed_at = task
+        if status == 'Завершено' and completed_at:
+            # Если задача завершена, добавляем время завершения
+            display_text = f'{task_text} (Завершено: {completed_at})'
+        else:
+            if due_date and due_time:
+                display_text = f'{task_text} (До {due_date} {due_time})'
+            elif due_date:
+                display_text = f'{task_text} (До {due_date})'
+            elif due_time:
+                display_text = f'{task_text} (До {due_time})'
+            else:
+                display_text = f'{task_text}'
+
+        item = QListWidgetItem(display_text)
+        # Установка цвета фона в зависимости от приоритета
+        if priority == 'Высокий':
+            item.setBackground(QColor('#bf616a'))  # Красный
+            item.setForeground(QColor('#2e3440'))
+        elif priority == 'Средний':
+            item.setBackground(QColor('#ebcb8b'))  # Желтый
+            item.setForeground(QColor('#2e3440'))
+        elif priority == 'Низкий':
+            item.setBackground(QColor('#a3be8c'))  # Зеленый
+            item.setForeground(QColor('#2e3440'))
+
+        # Добавление описания как подсказки
+        if description:
+            item.setToolTip(description)
+
+        # Сохранение task_id, priority и ключа сортировки в данных элемента
+        item.setData(Qt.UserRole, task_id)
+        item.setData(Qt.UserRole + 1, priority)
+        if self.fuzzy_text:
+            item.setData(Qt.UserRole + 2, (-self.search_scores.get(task_id, 0), task_id))
+            item.setData(Qt.UserRole + 3, self.fuzzy_text)
+        else:
+            item.setData(Qt.UserRole + 2, (due_date or '', due_time or '', task_id))
+        return item
+
+    def remove_task_item(self, task_id):
+        item = self.task_items.pop(task_id, None)
+        if item is not None:
+            list_widget = item.listWidget()
+            if list_widget is not None:
+                list_widget.takeItem(list_widget.row(item))
+
+    def insert_task_item(self, list_widget, item):
+        # Бинарный поиск позиции, чтобы сохранить порядок ORDER BY due_date, due_time
+        key = item.data(Qt.UserRole + 2)
+        low, high = 0, list_widget.count()
+        while low < high:
+            middle = (low + high) // 2
+            if list_widget.item(middle).data(Qt.UserRole + 2) < key:
+                low = middle + 1
+            else:
+                high = middle
+        list_widget.insertItem(low, item)
+
+    def sync_external_changes(self, own_ids=()):
+        # Дешёвая проверка: без чужих изменений дальше PRAGMA data_version не идём
+        try:
+            if not own_ids and not self.change_watcher.has_changes():
+                return
+            changed_ids = self.change_watcher.fetch_changed_ids()
+        except Exception as e:
+            logger.error('Ошибка проверки изменений базы данных: %s', e)
+            return
+
+        filter_text = self.search_input.text().strip()
+        priority_filter = self.filter_combo.currentText()
+        if changed_ids is None or len(changed_ids) > SYNC_BATCH_LIMIT:
+            # Журнал уже обрезан или изменений слишком много — дешевле перечитать всё
+            self.load_tasks(filter_text=filter_text, priority_filter=priority_filter)
+            return
+        # Свои изменения уже показаны — повторная перестройка сбросила бы выделение
+        changed_ids -= set(own_ids)
+        if not changed_ids:
+            return
+
+        try:
+            self.refresh_task_items(changed_ids)
+        except Exception as e:
+            logger.error('Ошибка загрузки изменённых задач: %s', e)
+
+    def mark_synced(self, task_ids):
+        # После своей записи и обновления доски продвигаем журнал изменений,
+        # заодно подхватывая чужие изменения, зафиксированные за это время
+        self.sync_external_changes(own_ids=task_ids)
+
+    def refresh_task_items(self, task_ids):
+        # Точечное обновление доски: перечитываем только задачи task_ids
+        if self.fuzzy_text:
+            # При нечётком поиске похожесть изменённых задач пересчитывается на месте
+            query, params = queries.tasks_by_ids_query(task_ids, self.filter_combo.currentText())
+            query_trigrams = search.trigrams(self.fuzzy_text)
+            # Старые оценки изменённых задач недействительны
+            for task_id in task_ids:
+                self.search_scores.pop(task_id, None)
+            tasks = []
+            for task in get_connection().execute(query, params).fetchall():
+                score = search.similarity(query_trigrams, task[1], task[2])
+                if score >= search.MIN_SIMILARITY:
+                    self.search_scores[task[0]] = score
+                    if task[6] not in self.collapsed_statuses:
+                        tasks.append(task)
+        else:
+            query, params = queries.changed_tasks_query(
+                task_ids, self.search_input.text().strip(), self.filter_combo.currentText(),
+                self.expanded_statuses()
+            )
+            tasks = get_connection().execute(query, params).fetchall()
+
+        # Удалённые задачи и задачи, переставшие подходить под фильтр, просто исчезают
+        for task_id in task_ids:
+            self.remove_task_item(task_id)
+        for task in tasks:
+            list_widget = self.status_lists.get(task[6])
+            if list_widget is not None:
+                item = self.create_task_item(task)
+                self.insert_task_item(list_widget, item)
+                self.task_items[task[0]] = item
+
+        if self.current_view is not None:
+            # Новые и изменённые задачи проверяются по обновлённому набору вида
+            view_ids = self.view_cache.get_ids(get_connection(), self.current_view)
+            for task_id in task_ids:
+                item = self.task_items.get(task_id)
+                if item is not None:
+                    item.setHidden(task_id not in view_ids)
+        self.update_column_counts()
 
     def search_tasks(self):
         search_text = self.search_input.text().strip()
@@ -505,21 +941,95 @@ class TaskManager(QWidget):
         priority_filter = self.filter_combo.currentText()
         self.load_tasks(filter_text=search_text, priority_filter=priority_filter)
 
+    def reload_view_combo(self, selected_name=None):
+        self.view_combo.blockSignals(True)
+        self.view_combo.clear()
+        self.view_combo.addItem('Все задачи', None)
+        for view in views.BUILTIN_VIEWS:
+            self.view_combo.addItem(view.name, view)
+        try:
+            for view in views.load_saved_views(get_connection()):
+                self.view_combo.addItem(f'★ {view.name}', view)
+        except Exception as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось загрузить сохранённые виды.\n{e}')
+        index = 0
+        for i in range(self.view_combo.count()):
+            view = self.view_combo.itemData(i)
+            if view is not None and view.name == selected_name and view not in views.BUILTIN_VIEWS:
+                index = i
+        self.view_combo.setCurrentIndex(index)
+        self.view_combo.blockSignals(False)
+        self.select_view()
+
+    def select_view(self):
+        self.current_view = self.view_combo.currentData()
+        self.delete_view_button.setEnabled(
+            self.current_view is not None and self.current_view not in views.BUILTIN_VIEWS
+        )
+        if hasattr(self, 'task_items'):
+            self.apply_view()
+
+    def apply_view(self):
+        # Вид не перестраивает доску: элементы вне вида просто скрываются
+        try:
+            with timed('views.apply'):
+                view_ids = None
+                if self.current_view is not None:
+                    view_ids = self.view_cache.get_ids(get_connection(), self.current_view)
+                for list_widget in self.status_lists.values():
+                    list_widget.setUpdatesEnabled(False)
+                for task_id, item in self.task_items.items():
+                    hidden = view_ids is not None and task_id not in view_ids
+                    if item.isHidden() != hidden:
+                        item.setHidden(hidden)
+                for list_widget in self.status_lists.values():
+                    list_widget.setUpdatesEnabled(True)
+        except Exception as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось применить вид.\n{e}')
+
+    def save_view(self):
+        dialog = SavedViewDialog(self.current_view, self)
+        if dialog.exec_() == QDialog.Accepted:
+            view = dialog.get_view()
+            if not view.name:
+                QMessageBox.warning(self, 'Ошибка', 'Название вида не может быть пустым.')
+                return
+            try:
+                views.save_view(get_connection(), view)
+                self.reload_view_combo(selected_name=view.name)
+            except Exception as e:
+                QMessageBox.warning(self, 'Ошибка', f'Не удалось сохранить вид.\n{e}')
+
+    def delete_view(self):
+        view = self.current_view
+        if view is None or view in views.BUILTIN_VIEWS:
+            return
+        try:
+            views.delete_view(get_connection(), view.name)
+            self.view_cache.forget(view)
+            self.reload_view_combo()
+        except Exception as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось удалить вид.\n{e}')
+
     def update_task_status(self, task_id, new_status):
-        print(f'Updating task_id: {task_id} to new_status: {new_status}')  # Отладка
+        logger.debug('Updating task_id: %s to new_status: %s', task_id, new_status)
         try:
-            conn = create_connection()
-            cursor = conn.cursor()
             if new_status == 'Завершено':
                 # Устанавливаем текущую дату и время как время завершения
                 completed_at = QDate.currentDate().toString('yyyy-MM-dd') + ' ' + QTime.currentTime().toString('HH:mm')
-                cursor.execute('UPDATE tasks SET status = ?, completed_at = ? WHERE id = ?', (new_status, completed_at, task_id))
             else:
                 # Если статус изменяется с "Завершено" на другой, очищаем поле completed_at
-                cursor.execute('UPDATE tasks SET status = ?, completed_at = NULL WHERE id = ?', (new_status, task_id))
-            conn.commit()
-            conn.close()
-            self.load_tasks(filter_text=self.search_input.text().strip(), priority_filter=self.filter_combo.currentText())
+                completed_at = None
+            conn = get_connection()
+            with conn:
+                before = undo.fetch_rows(conn, [task_id])
+                conn.execute(queries.UPDATE_TASK_STATUS, {'status': new_status, 'completed_at': completed_at, 'id': task_id})
+            # Созданное следующее повторение отменяется вместе с перемещением
+            task_ids = [task_id] + self.materialize_next_occurrences([task_id], new_status)
+            after = undo.fetch_rows(conn, task_ids)
+            self.record_undo('Перемещение задачи', before, after)
+            self.refresh_task_items(task_ids)
+            self.mark_synced(task_ids)
         except Exception as e:
             QMessageBox.warning(self, 'Ошибка', f'Не удалось обновить статус задачи.\n{e}')
 
@@ -539,30 +1049,37 @@ class TaskManager(QWidget):
 
         if task_text:
             try:
-                conn = create_connection()
-                cursor = conn.cursor()
+                completed_at = None
                 if selected_status == 'Завершено':
                     # Если задача сразу ставится в завершено, устанавливаем completed_at
                     completed_at = QDate.currentDate().toString('yyyy-MM-dd') + ' ' + QTime.currentTime().toString('HH:mm')
-                    cursor.execute(
-                        'INSERT INTO tasks (task, description, due_date, due_time, priority, status, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
-                        (task_text, description, due_date, due_time, priority, selected_status, completed_at)
-                    )
+                conn = get_connection()
+                rule = self.repeat_combo.currentData()
+                if rule:
+                    # Серия хранится один раз, задачи-экземпляры создаются по мере надобности.
+                    # Отмена удаляет созданные экземпляры вместе с серией (см. undo._apply).
+                    series_id = recurrence.create_series(conn, task_text, description, due_date, due_time, priority, rule)
+                    task_ids = recurrence.materialize(conn, series_ids=[series_id])
+                    self.record_undo('Добавление задачи', {}, undo.fetch_rows(conn, task_ids))
                 else:
-                    cursor.execute(
-                        'INSERT INTO tasks (task, description, due_date, due_time, priority, status) VALUES (?, ?, ?, ?, ?, ?)',
-                        (task_text, description, due_date, due_time, priority, selected_status)
-                    )
-                conn.commit()
-                conn.close()
+                    with conn:
+                        cursor = conn.execute(
+                            queries.INSERT_TASK,
+                            queries.task_params(task_text, description, due_date, due_time, priority, selected_status, completed_at)
+                        )
+                        task_ids = [cursor.lastrowid]
+                        after = undo.fetch_rows(conn, task_ids)
+                    self.record_undo('Добавление задачи', {}, after)
                 self.task_input.clear()
                 self.description_input.clear()
                 self.date_edit.setDate(QDate.currentDate())
                 self.time_edit.setTime(QTime.currentTime())
                 self.priority_combo.setCurrentIndex(1)  # Средний
+                self.repeat_combo.setCurrentIndex(0)
                 # Сбросить статус на дефолтный
                 self.status_buttons['Сделать'].setChecked(True)
-                self.load_tasks(filter_text=self.search_input.text().strip(), priority_filter=self.filter_combo.currentText())
+                self.refresh_task_items(task_ids)
+                self.mark_synced(task_ids)
             except Exception as e:
                 QMessageBox.warning(self, 'Ошибка', f'Не удалось добавить задачу.\n{e}')
         else:
@@ -589,24 +1106,27 @@ class TaskManager(QWidget):
                 new_task_text, new_description, new_due_date, new_due_time, new_priority, new_status = dialog.get_values()
                 if new_task_text:
                     try:
-                        conn = create_connection()
-                        cursor = conn.cursor()
                         if new_status == 'Завершено':
                             # Устанавливаем completed_at
                             completed_at = QDate.currentDate().toString('yyyy-MM-dd') + ' ' + QTime.currentTime().toString('HH:mm')
-                            cursor.execute(
-                                'UPDATE tasks SET task = ?, description = ?, due_date = ?, due_time = ?, priority = ?, status = ?, completed_at = ? WHERE id = ?',
-                                (new_task_text, new_description, new_due_date, new_due_time, new_priority, new_status, completed_at, task_id)
-                            )
                         else:
                             # Если статус изменяется с "Завершено" на другой, очищаем completed_at
-                            cursor.execute(
-                                'UPDATE tasks SET task = ?, description = ?, due_date = ?, due_time = ?, priority = ?, status = ?, completed_at = NULL WHERE id = ?',
-                                (new_task_text, new_description, new_due_date, new_due_time, new_priority, new_status, task_id)
+                            completed_at = None
+                        conn = get_connection()
+                        with conn:
+                            before = undo.fetch_rows(conn, [task_id])
+                            conn.execute(
+                                queries.UPDATE_TASK,
+                                queries.task_params(
+                                    new_task_text, new_description, new_due_date, new_due_time,
+                                    new_priority, new_status, completed_at, task_id=task_id
+                                )
                             )
-                        conn.commit()
-                        conn.close()
-                        self.load_tasks(filter_text=self.search_input.text().strip(), priority_filter=self.filter_combo.currentText())
+                        task_ids = [task_id] + self.materialize_next_occurrences([task_id], new_status)
+                        after = undo.fetch_rows(conn, task_ids)
+                        self.record_undo('Изменение задачи', before, after)
+                        self.refresh_task_items(task_ids)
+                        self.mark_synced(task_ids)
                     except Exception as e:
                         QMessageBox.warning(self, 'Ошибка', f'Не удалось обновить задачу.\n{e}')
                 else:
@@ -627,100 +1147,260 @@ class TaskManager(QWidget):
                 QMessageBox.warning(self, 'Ошибка', 'Не удалось определить ID задачи.')
                 return
 
-            reply = QMessageBox.question(
-                self,
-                'Удалить задачу',
-                'Вы уверены, что хотите удалить эту задачу?',
-                QMessageBox.Yes | QMessageBox.No,
-                QMessageBox.No
-            )
-            if reply == QMessageBox.Yes:
-                try:
-                    conn = create_connection()
-                    cursor = conn.cursor()
-                    cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
-                    conn.commit()
-                    conn.close()
-                    self.load_tasks(filter_text=self.search_input.text().strip(), priority_filter=self.filter_combo.currentText())
-                except Exception as e:
-                    QMessageBox.warning(self, 'Ошибка', f'Не удалось удалить задачу.\n{e}')
+            # Подтверждение не требуется: удаление можно отменить (Ctrl+Z)
+            try:
+                conn = get_connection()
+                with conn:
+                    before = undo.fetch_rows(conn, [task_id])
+                    conn.execute(queries.DELETE_TASK, {'id': task_id})
+                self.record_undo('Удаление задачи', before, {})
+                self.refresh_task_items([task_id])
+                self.mark_synced([task_id])
+            except Exception as e:
+                QMessageBox.warning(self, 'Ошибка', f'Не удалось удалить задачу.\n{e}')
         else:
             QMessageBox.warning(self, 'Ошибка', 'Задача не выбрана.')
 
+    def materialize_recurring(self, series_ids=None):
+        # Ошибка в повторениях не должна мешать работе с остальными задачами
+        try:
+            return recurrence.materialize(get_connection(), series_ids=series_ids)
+        except Exception as e:
+            logger.error('Ошибка создания повторяющихся задач: %s', e)
+            return []
+
+    def materialize_next_occurrences(self, task_ids, new_status):
+        # Завершение экземпляра серии создаёт следующий
+        if new_status != 'Завершено':
+            return []
+        series_ids = [row[0] for row in get_connection().execute(
+            queries.SELECT_SERIES_OF_TASKS, {'ids': queries.ids_param(task_ids)}
+        ).fetchall()]
+        return self.materialize_recurring(series_ids) if series_ids else []
+
+    def refresh_recurring(self):
+        task_ids = self.materialize_recurring()
+        if task_ids:
+            self.refresh_task_items(task_ids)
+            self.mark_synced(task_ids)
+
+    def series_of_item(self, item):
+        try:
+            return recurrence.series_of_task(get_connection(), item.data(Qt.UserRole))
+        except Exception as e:
+            logger.error('Ошибка чтения серии задачи: %s', e)
+            return None
+
+    def stop_recurrence(self, series_id):
+        try:
+            recurrence.delete_series(get_connection(), series_id)
+        except Exception as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось остановить повторение.\n{e}')
+
+    def record_undo(self, label, before, after):
+        self.undo_stack.record(label, before, after)
+        self.update_undo_actions()
+
+    def update_undo_actions(self):
+        self.undo_action.setEnabled(self.undo_stack.can_undo())
+        self.undo_action.setToolTip(f'Отменить: {self.undo_stack.undo_label()} (Ctrl+Z)' if self.undo_stack.can_undo() else 'Отменить (Ctrl+Z)')
+        self.redo_action.setEnabled(self.undo_stack.can_redo())
+        self.redo_action.setToolTip(f'Повторить: {self.undo_stack.redo_label()} (Ctrl+Y)' if self.undo_stack.can_redo() else 'Повторить (Ctrl+Y)')
+
+    def undo_last(self):
+        if not self.undo_stack.can_undo():
+            return
+        try:
+            task_ids = self.undo_stack.undo(get_connection())
+            self.apply_undo_result(task_ids)
+        except Exception as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось отменить действие.\n{e}')
+        self.update_undo_actions()
+
+    def redo_last(self):
+        if not self.undo_stack.can_redo():
+            return
+        try:
+            task_ids = self.undo_stack.redo(get_connection())
+            self.apply_undo_result(task_ids)
+        except Exception as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось повторить действие.\n{e}')
+        self.update_undo_actions()
+
+    def apply_undo_result(self, task_ids):
+        if len(task_ids) > SYNC_BATCH_LIMIT:
+            self.load_tasks(filter_text=self.search_input.text().strip(), priority_filter=self.filter_combo.currentText())
+        else:
+            self.refresh_task_items(task_ids)
+            self.mark_synced(task_ids)
+
     def export_tasks(self):
         options = QFileDialog.Options()
         file_name, _ = QFileDialog.getSaveFileName(self, "Экспортировать задачи в CSV", "", "CSV Files (*.csv);;All Files (*)", options=options)
         if file_name:
             try:
-                conn = create_connection()
-                cursor = conn.cursor()
-                cursor.execute('SELECT id, task, description, due_date, due_time, priority, status, completed_at FROM tasks')
-                tasks = cursor.fetchall()
-                conn.close()
+                conn = get_connection()
+                tasks = conn.execute(queries.SELECT_ALL_TASKS).fetchall()
+                tasks += conn.execute(queries.SELECT_ALL_ARCHIVED_TASKS).fetchall()
+                database_id = importer.database_id(conn)
                 with open(file_name, 'w', newline='', encoding='utf-8') as csvfile:
                     writer = csv.writer(csvfile)
-                    writer.writerow(['ID', 'Задача', 'Описание', 'Дата выполнения', 'Время выполнения', 'Приоритет', 'Статус', 'Завершено в'])
-                    writer.writerows(tasks)
+                    writer.writerow(importer.EXPORT_HEADER)
+                    writer.writerows(task + (database_id,) for task in tasks)
                 QMessageBox.information(self, 'Успех', 'Задачи успешно экспортированы.')
             except Exception as e:
                 QMessageBox.warning(self, 'Ошибка', f'Не удалось экспортировать задачи.\n{e}')
 
     def import_tasks(self):
         options = QFileDialog.Options()
-        file_name, _ = QFileDialog.getOpenFileName(self, "Импортировать задачи из CSV", "", "CSV Files (*.csv);;All Files (*)", options=options)
-        if file_name:
+        file_names, _ = QFileDialog.getOpenFileNames(self, "Импортировать задачи из CSV", "", "CSV Files (*.csv);;All Files (*)", options=options)
+        if file_names:
             try:
-                with open(file_name, 'r', newline='', encoding='utf-8') as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    tasks = []
-                    for row in reader:
-                        task_text = row['Задача']
-                        description = row['Описание']
-                        due_date = row['Дата выполнения']
-                        due_time = row['Время выполнения']
-                        priority = row['Приоритет']
-                        status = row['Статус']
-                        completed_at = row.get('Завершено в')  # Новое поле
-                        tasks.append((task_text, description, due_date, due_time, priority, status, completed_at))
-                conn = create_connection()
-                cursor = conn.cursor()
-                cursor.executemany('''
-                    INSERT INTO tasks (task, description, due_date, due_time, priority, status, completed_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', tasks)
-                conn.commit()
-                conn.close()
+                conn = get_connection()
+                result = importer.import_files(conn, file_names)
+                after = undo.fetch_rows(conn, result.inserted + result.updated)
+                self.record_undo('Импорт задач', result.before, after)
                 self.load_tasks(filter_text=self.search_input.text().strip(), priority_filter=self.filter_combo.currentText())
-                QMessageBox.information(self, 'Успех', 'Задачи успешно импортированы.')
+                message = (
+                    f'Добавлено задач: {len(result.inserted)}\n'
+                    f'Обновлено задач: {len(result.updated)}\n'
+                    f'Пропущено дубликатов: {result.duplicates}'
+                )
+                if result.errors:
+                    # Показываем только первые ошибки, остальные — в журнале
+                    for error in result.errors:
+                        logger.warning('Импорт: %s', error)
+                    message += f'\nПропущено строк с ошибками: {len(result.errors)}\n\n' + '\n'.join(result.errors[:10])
+                    QMessageBox.warning(self, 'Импорт завершён с ошибками', message)
+                else:
+                    QMessageBox.information(self, 'Успех', f'Задачи успешно импортированы.\n{message}')
             except Exception as e:
                 QMessageBox.warning(self, 'Ошибка', f'Не удалось импортировать задачи.\n{e}')
 
     def initTimer(self):
         self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh_recurring)  # С наступлением нового дня появляются его повторения
         self.timer.timeout.connect(self.check_reminders)
+        self.timer.timeout.connect(self.apply_view)  # "Просроченные" зависят от текущего времени
         self.timer.start(60000)  # Проверять каждую минуту
 
+        # Опрос изменений, сделанных другими экземплярами приложения
+        self.sync_timer = QTimer(self)
+        self.sync_timer.timeout.connect(self.sync_external_changes)
+        self.sync_timer.start(SYNC_INTERVAL)
+
+        # Фоновый перенос давно завершённых задач в архив
+        self.archive_timer = QTimer(self)
+        self.archive_timer.setSingleShot(True)
+        self.archive_timer.timeout.connect(self.run_archive_step)
+        self.archive_timer.start(ARCHIVE_START_DELAY)
+
+    def run_archive_step(self):
+        moved = 0
+        try:
+            conn = get_connection()
+            moved = archive.archive_batch(conn)
+            if moved < archive.ARCHIVE_BATCH_SIZE:
+                # Перенос закончен — возвращаем освободившееся место
+                archive.reclaim_space(conn, 'main')
+                archive.reclaim_space(conn, 'archive')
+        except Exception as e:
+            logger.error('Ошибка архивации задач: %s', e)
+        if moved:
+            self.update_column_counts()
+            if self.archive_action.isChecked():
+                self.reset_archive_list()
+        # Пока есть что переносить, следующая пачка идёт почти сразу
+        self.archive_timer.start(ARCHIVE_BUSY_INTERVAL if moved >= archive.ARCHIVE_BATCH_SIZE else ARCHIVE_INTERVAL)
+
     def check_reminders(self):
         try:
-            conn = create_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT id, task, due_date, due_time FROM tasks WHERE status != "Завершено"')
-            tasks = cursor.fetchall()
-            conn.close()
-            current_qdate = QDate.currentDate()
-            current_qtime = QTime.currentTime()
-            for task in tasks:
-                task_id, task_text, due_date, due_time = task
-                if due_date and due_time:
-                    task_qdate = QDate.fromString(due_date, 'yyyy-MM-dd')
-                    task_qtime = QTime.fromString(due_time, 'HH:mm')
-                    if task_qdate == current_qdate:
-                        seconds_until_due = current_qtime.secsTo(task_qtime)
-                        if 0 < seconds_until_due <= 300:  # 5 минут
-                            QMessageBox.information(self, 'Напоминание', f'Задача "{task_text}" должна быть выполнена через 5 минут.')
+            due_soon = []
+            with timed('check_reminders'):
+                current_qdate = QDate.currentDate()
+                tasks = get_connection().execute(
+                    queries.SELECT_REMINDER_CANDIDATES, {'today': current_qdate.toString('yyyy-MM-dd')}
+                ).fetchall()
+                current_qtime = QTime.currentTime()
+                for task in tasks:
+                    task_id, task_text, due_date, due_time = task
+                    if due_date and due_time:
+                        task_qdate = QDate.fromString(due_date, 'yyyy-MM-dd')
+                        task_qtime = QTime.fromString(due_time, 'HH:mm')
+                        if task_qdate == current_qdate:
+                            seconds_until_due = current_qtime.secsTo(task_qtime)
+                            if 0 < seconds_until_due <= 300:  # 5 минут
+                                due_soon.append(task_text)
+            # Модальные окна показываются вне замера, чтобы не искажать время проверки
+            for task_text in due_soon:
+                QMessageBox.information(self, 'Напоминание', f'Задача "{task_text}" должна быть выполнена через 5 минут.')
         except Exception as e:
             QMessageBox.warning(self, 'Ошибка', f'Не удалось проверить напоминания.\n{e}')
 
+    def toggle_performance_dialog(self):
+        if self.performance_dialog is None:
+            self.performance_dialog = PerformanceDialog(self)
+        if self.performance_dialog.isVisible():
+            self.performance_dialog.hide()
+        else:
+            self.performance_dialog.show()
+
+    def toggle_archive(self, checked):
+        self.archive_container.setVisible(checked)
+        if checked:
+            self.reset_archive_list()
+        else:
+            self.archive_list.clear()
+            self.archive_exhausted = True
+
+    def reset_archive_list(self):
+        self.archive_list.clear()
+        self.archive_last_key = None
+        self.archive_exhausted = False
+        self.load_archive_page()
+
+    def load_archive_page(self):
+        if self.archive_exhausted:
+            return
+        try:
+            with timed('load_archive_page'):
+                query, params = queries.load_archive_query(
+                    self.search_input.text().strip(), self.filter_combo.currentText(),
+                    after=self.archive_last_key, limit=ARCHIVE_PAGE_SIZE
+                )
+                tasks = get_connection().execute(query, params).fetchall()
+                for task in tasks:
+                    self.archive_list.addItem(self.create_task_item(task))
+        except Exception as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось загрузить архив.\n{e}')
+            return
+        if tasks:
+            self.archive_last_key = (tasks[-1][7], tasks[-1][0])
+        self.archive_exhausted = len(tasks) < ARCHIVE_PAGE_SIZE
+
+    def on_archive_scrolled(self, value):
+        # Следующая страница архива подгружается при прокрутке до конца
+        if value == self.archive_list.verticalScrollBar().maximum():
+            self.load_archive_page()
+
+    def restore_archived_task(self, item):
+        task_id = item.data(Qt.UserRole)
+        try:
+            archive.restore_tasks(get_connection(), [task_id])
+            self.archive_list.takeItem(self.archive_list.row(item))
+            self.refresh_task_items([task_id])
+            self.mark_synced([task_id])
+        except Exception as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось вернуть задачу из архива.\n{e}')
+
+    def display_archived_description(self, item):
+        try:
+            result = get_connection().execute(queries.SELECT_ARCHIVED_DESCRIPTION, {'id': item.data(Qt.UserRole)}).fetchone()
+            self.description_display.setText(result[0] if result and result[0] else 'Нет описания.')
+        except Exception as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось загрузить описание задачи.\n{e}')
+            self.description_display.setText('')
+
     def display_task_description(self, item):
         # Извлекаем task_id из данных элемента
         task_id = item.data(Qt.UserRole)
@@ -729,11 +1409,7 @@ class TaskManager(QWidget):
             return
 
         try:
-            conn = create_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT description FROM tasks WHERE id = ?', (task_id,))
-            result = cursor.fetchone()
-            conn.close()
+            result = get_connection().execute(queries.SELECT_DESCRIPTION, {'id': task_id}).fetchone()
             if result and result[0]:
                 self.description_display.setText(result[0])
             else:
@@ -742,6 +1418,159 @@ class TaskManager(QWidget):
             QMessageBox.warning(self, 'Ошибка', f'Не удалось загрузить описание задачи.\n{e}')
             self.description_display.setText('')
 
+class PerformanceDialog(QDialog):
+    """
+    Немодальное окно со статистикой замеров: p50/p95/max по операциям и счётчики.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Производительность')
+        self.setMinimumSize(700, 400)
+        self.initUI()
+
+        # Обновляем таблицу только пока окно открыто
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(['Операция', 'Замеров', 'p50, мс', 'p95, мс', 'max, мс'])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.counters_label = QLabel()
+        self.counters_label.setWordWrap(True)
+        layout.addWidget(self.counters_label)
+
+        button_layout = QHBoxLayout()
+        reset_button = QPushButton('Сбросить')
+        reset_button.clicked.connect(self.reset)
+        button_layout.addWidget(reset_button)
+
+        self.profile_button = QPushButton()
+        self.profile_button.clicked.connect(self.toggle_profiling)
+        button_layout.addWidget(self.profile_button)
+        layout.addLayout(button_layout)
+        self.update_profile_button()
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start(1000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        rows, counters = instrumentation.snapshot()
+        self.table.setRowCount(len(rows))
+        for row_index, (name, samples, p50, p95, maximum) in enumerate(rows):
+            values = [name, str(samples), f'{p50:.2f}', f'{p95:.2f}', f'{maximum:.2f}']
+            for column, value in enumerate(values):
+                self.table.setItem(row_index, column, QTableWidgetItem(value))
+        self.counters_label.setText(
+            'Счётчики: ' + ', '.join(f'{name} = {value}' for name, value in sorted(counters.items()))
+        )
+
+    def reset(self):
+        instrumentation.reset()
+        self.refresh()
+
+    def update_profile_button(self):
+        if instrumentation.is_profiling():
+            self.profile_button.setText('Остановить профилирование и сохранить...')
+        else:
+            self.profile_button.setText('Начать профилирование (cProfile)')
+
+    def toggle_profiling(self):
+        if not instrumentation.is_profiling():
+            instrumentation.start_profiling()
+        else:
+            file_name, _ = QFileDialog.getSaveFileName(self, "Сохранить профиль", "task_manager.prof", "Profile Files (*.prof);;All Files (*)")
+            if file_name:
+                try:
+                    instrumentation.stop_profiling(file_name)
+                except Exception as e:
+                    QMessageBox.warning(self, 'Ошибка', f'Не удалось сохранить профиль.\n{e}')
+        self.update_profile_button()
+
+class SavedViewDialog(QDialog):
+    """
+    Диалог создания сохранённого вида из набора условий.
+    """
+    def __init__(self, view=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Сохранить вид')
+        self.setMinimumSize(400, 300)
+        self.initUI(view)
+
+    def initUI(self, view):
+        self.layout = QFormLayout(self)
+
+        self.name_input = QLineEdit()
+        self.layout.addRow('Название:', self.name_input)
+
+        self.status_checks = {}
+        status_layout = QHBoxLayout()
+        for status in ['Сделать', 'В работе', 'На проверке', 'Завершено']:
+            check = QCheckBox(status)
+            self.status_checks[status] = check
+            status_layout.addWidget(check)
+        self.layout.addRow('Статус:', status_layout)
+
+        self.priority_checks = {}
+        priority_layout = QHBoxLayout()
+        for priority in ['Низкий', 'Средний', 'Высокий']:
+            check = QCheckBox(priority)
+            self.priority_checks[priority] = check
+            priority_layout.addWidget(check)
+        self.layout.addRow('Приоритет:', priority_layout)
+
+        self.due_combo = QComboBox()
+        for key, label in views.DUE_RANGES.items():
+            self.due_combo.addItem(label, key)
+        self.layout.addRow('Срок:', self.due_combo)
+
+        self.completed_combo = QComboBox()
+        for key, label in views.COMPLETED_RANGES.items():
+            self.completed_combo.addItem(label, key)
+        self.layout.addRow('Завершено:', self.completed_combo)
+
+        self.text_input = QLineEdit()
+        self.text_input.setPlaceholderText('Текст в названии или описании')
+        self.layout.addRow('Текст:', self.text_input)
+
+        self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, parent=self)
+        self.buttons.accepted.connect(self.accept)
+        self.buttons.rejected.connect(self.reject)
+        self.layout.addRow(self.buttons)
+
+        # Условия текущего вида служат отправной точкой для нового
+        if view is not None:
+            if view not in views.BUILTIN_VIEWS:
+                self.name_input.setText(view.name)
+            for status in view.statuses:
+                self.status_checks[status].setChecked(True)
+            for priority in view.priorities:
+                self.priority_checks[priority].setChecked(True)
+            self.due_combo.setCurrentIndex(max(0, self.due_combo.findData(view.due)))
+            self.completed_combo.setCurrentIndex(max(0, self.completed_combo.findData(view.completed)))
+            self.text_input.setText(view.text)
+
+    def get_view(self):
+        return views.make_view(
+            self.name_input.text().strip(),
+            [status for status, check in self.status_checks.items() if check.isChecked()],
+            [priority for priority, check in self.priority_checks.items() if check.isChecked()],
+            self.due_combo.currentData(),
+            self.completed_combo.currentData(),
+            self.text_input.text(),
+        )
+
 class UpdateTaskDialog(QDialog):
     def __init__(self, task_id, parent=None):
         super().__init__(parent)
@@ -835,13 +1664,9 @@ class UpdateTaskDialog(QDialog):
 
     def load_task_data(self):
         try:
-            conn = create_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT task, description, due_date, due_time, priority, status FROM tasks WHERE id = ?', (self.task_id,))
-            result = cursor.fetchone()
-            conn.close()
+            result = get_connection().execute(queries.SELECT_TASK, {'id': self.task_id}).fetchone()
             if result:
-                task_text, description, due_date, due_time, priority, status = result
+                _, task_text, description, due_date, due_time, priority, status, _ = result
                 self.task_input.setText(task_text)
                 self.description_input.setText(description)
                 if due_date:
@@ -879,12 +1704,26 @@ class UpdateTaskDialog(QDialog):
         return task_text, description, due_date, due_time, priority, status
 
 if __name__ == '__main__':
+    # Нужно для пула процессов импорта в собранном приложении
+    multiprocessing.freeze_support()
+    # Уровень логирования: TASK_MANAGER_LOG=DEBUG выводит замеры каждой операции
+    logging.basicConfig(
+        level=os.environ.get('TASK_MANAGER_LOG', 'WARNING').upper(),
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+    )
+    # TASK_MANAGER_PROFILE=путь сохраняет cProfile всей сессии при выходе
+    profile_file = os.environ.get('TASK_MANAGER_PROFILE')
+    if profile_file:
+        instrumentation.start_profiling()
     app = QApplication(sys.argv)
     try:
         window = TaskManager()
         window.resize(1600, 700)  # Увеличиваем размер основного окна для удобства
         window.show()
-        sys.exit(app.exec_())
+        exit_code = app.exec_()
+        if profile_file:
+            instrumentation.stop_profiling(profile_file)
+        sys.exit(exit_code)
     except Exception as e:
         QMessageBox.critical(None, 'Критическая ошибка', f'Произошла непредвиденная ошибка:\n{e}')
         sys.exit(1)
@@ -0,0 +1,410 @@
+# queries.py
+#
+# Все SQL-запросы к таблице tasks в одном месте.
+# Тексты запросов фиксированы (без склейки строк во время выполнения),
+# а значения передаются через именованные параметры, поэтому на постоянном
+# соединении каждый запрос разбирается и планируется один раз за процесс.
+
+import json
+
+TASK_COLUMNS = ('id', 'task', 'description', 'due_date', 'due_time', 'priority', 'status', 'completed_at')
+# Столбцы, которые задаёт пользователь (id назначает база)
+TASK_FIELDS = TASK_COLUMNS[1:]
+
+_SELECT_COLUMNS = ', '.join(TASK_COLUMNS)
+_INSERT_COLUMNS = ', '.join(TASK_FIELDS)
+_INSERT_VALUES = ', '.join(f':{column}' for column in TASK_FIELDS)
+_UPDATE_ASSIGNMENTS = ', '.join(f'{column} = :{column}' for column in TASK_FIELDS)
+
+_SEARCH = '(task LIKE :pattern OR description LIKE :pattern)'
+_STATUSES = 'status IN (SELECT value FROM json_each(:statuses))'
+_ORDER = 'ORDER BY due_date, due_time, id'
+
+# Статусы колонок доски в порядке отображения
+STATUSES = ('Сделать', 'В работе', 'На проверке', 'Завершено')
+
+# Загрузка доски: отдельный вариант для каждого сочетания фильтров,
+# чтобы у каждого был свой стабильный план. Свёрнутые колонки
+# исключаются условием по статусу и не читаются вовсе.
+LOAD_TASKS = f'SELECT {_SELECT_COLUMNS} FROM tasks WHERE {_SEARCH} AND {_STATUSES} {_ORDER}'
+LOAD_TASKS_BY_PRIORITY = (
+    f'SELECT {_SELECT_COLUMNS} FROM tasks WHERE {_SEARCH} AND {_STATUSES} AND priority = :priority {_ORDER}'
+)
+
+# Список задач API: страницы по возрастанию id, ключ — id последней задачи страницы
+LIST_TASKS_PAGE = f'SELECT {_SELECT_COLUMNS} FROM tasks WHERE id > :after AND {_STATUSES} ORDER BY id LIMIT :limit'
+LIST_TASKS_PAGE_BY_PRIORITY = (
+    f'SELECT {_SELECT_COLUMNS} FROM tasks WHERE id > :after AND {_STATUSES} AND priority = :priority '
+    'ORDER BY id LIMIT :limit'
+)
+
+# Перечитывание изменённых задач: список id передаётся одним JSON-параметром
+_CHANGED = 'id IN (SELECT value FROM json_each(:ids))'
+LOAD_CHANGED_TASKS = f'SELECT {_SELECT_COLUMNS} FROM tasks WHERE {_CHANGED} AND {_SEARCH} AND {_STATUSES}'
+LOAD_CHANGED_TASKS_BY_PRIORITY = (
+    f'SELECT {_SELECT_COLUMNS} FROM tasks WHERE {_CHANGED} AND {_SEARCH} AND {_STATUSES} AND priority = :priority'
+)
+
+SELECT_TASK = f'SELECT {_SELECT_COLUMNS} FROM tasks WHERE id = :id'
+SELECT_TASKS_BY_IDS = f'SELECT {_SELECT_COLUMNS} FROM tasks WHERE {_CHANGED}'
+SELECT_TASKS_BY_IDS_AND_PRIORITY = f'SELECT {_SELECT_COLUMNS} FROM tasks WHERE {_CHANGED} AND priority = :priority'
+SELECT_TASKS_AFTER_ID = f'SELECT {_SELECT_COLUMNS} FROM tasks WHERE id > :id'
+SELECT_MAX_TASK_ID = 'SELECT COALESCE(MAX(id), 0) FROM tasks'
+SELECT_ALL_TASKS = f'SELECT {_SELECT_COLUMNS} FROM tasks'
+SELECT_DESCRIPTION = 'SELECT description FROM tasks WHERE id = :id'
+SELECT_REMINDER_CANDIDATES = (
+    "SELECT id, task, due_date, due_time FROM tasks WHERE due_date = :today AND status != 'Завершено'"
+)
+
+INSERT_TASK = f'INSERT INTO tasks ({_INSERT_COLUMNS}) VALUES ({_INSERT_VALUES})'
+INSERT_TASK_WITH_ID = f'INSERT INTO tasks (id, {_INSERT_COLUMNS}) VALUES (:id, {_INSERT_VALUES})'
+UPDATE_TASK = f'UPDATE tasks SET {_UPDATE_ASSIGNMENTS} WHERE id = :id'
+UPDATE_TASK_STATUS = 'UPDATE tasks SET status = :status, completed_at = :completed_at WHERE id = :id'
+DELETE_TASK = 'DELETE FROM tasks WHERE id = :id'
+# Нечёткий поиск по триграммному индексу tasks_fts (см. search.py):
+# точные вхождения читаются страницами по rowid без общего ограничения,
+# похожие задачи — одной выборкой кандидатов по редким триграммам
+EXACT_MATCH_IDS = (
+    'SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH :match AND rowid > :after ORDER BY rowid LIMIT :limit'
+)
+# :terms — JSON-массив выражений MATCH (по одному на триграмму); кандидаты
+# упорядочены по числу совпавших выражений
+FUZZY_CANDIDATES = (
+    'SELECT id, task, description FROM tasks WHERE id IN ('
+    'SELECT f.rowid FROM json_each(:terms) AS t JOIN tasks_fts AS f ON f.tasks_fts MATCH t.value '
+    'GROUP BY f.rowid ORDER BY count(*) DESC, f.rowid LIMIT :limit)'
+)
+TRIGRAM_FREQUENCIES = (
+    'SELECT v.term, v.doc FROM json_each(:terms) AS t JOIN tasks_fts_vocab AS v ON v.term = t.value'
+)
+
+# Архив: завершённые задачи переносятся в таблицу tasks подключённой базы archive
+ARCHIVE_CANDIDATES = (
+    "SELECT id FROM main.tasks WHERE status = 'Завершено' AND completed_at < :cutoff "
+    "ORDER BY completed_at LIMIT :limit"
+)
+ARCHIVE_COPY = (
+    f'INSERT OR REPLACE INTO archive.tasks ({_SELECT_COLUMNS}, archived_at) '
+    f'SELECT {_SELECT_COLUMNS}, :archived_at FROM main.tasks WHERE {_CHANGED}'
+)
+# Удаляются только задачи, уже лежащие в архиве (см. archive.archive_batch)
+ARCHIVE_DELETE = f'DELETE FROM main.tasks WHERE {_CHANGED} AND id IN (SELECT id FROM archive.tasks WHERE {_CHANGED})'
+ARCHIVE_COPY_IMPORT_KEYS = (
+    'INSERT OR REPLACE INTO archive.task_import_keys (task_id, content_hash, external_id) '
+    'SELECT task_id, content_hash, external_id FROM main.task_import_keys WHERE task_id IN (SELECT value FROM json_each(:ids))'
+)
+# Чтение архива страницами по ключу (completed_at, id), от новых к старым
+_ARCHIVE_PAGE = '(completed_at < :completed_at OR (completed_at = :completed_at AND id < :id))'
+_ARCHIVE_ORDER = 'ORDER BY completed_at DESC, id DESC LIMIT :limit'
+LOAD_ARCHIVE = f'SELECT {_SELECT_COLUMNS} FROM archive.tasks WHERE {_ARCHIVE_PAGE} AND {_SEARCH} {_ARCHIVE_ORDER}'
+LOAD_ARCHIVE_BY_PRIORITY = (
+    f'SELECT {_SELECT_COLUMNS} FROM archive.tasks WHERE {_ARCHIVE_PAGE} AND {_SEARCH} '
+    f'AND priority = :priority {_ARCHIVE_ORDER}'
+)
+SELECT_ARCHIVED_DESCRIPTION = 'SELECT description FROM archive.tasks WHERE id = :id'
+# Возврат из архива: задача снова попадает в "Сделать"
+RESTORE_COPY = (
+    f'INSERT OR IGNORE INTO main.tasks (id, {_INSERT_COLUMNS}) '
+    f"SELECT id, task, description, due_date, due_time, priority, 'Сделать', NULL FROM archive.tasks WHERE {_CHANGED}"
+)
+RESTORE_DELETE = f'DELETE FROM archive.tasks WHERE {_CHANGED} AND id IN (SELECT id FROM main.tasks WHERE {_CHANGED})'
+# Внешний ID, занятый за время хранения в архиве другой задачей, не возвращается
+RESTORE_IMPORT_KEYS = (
+    'INSERT OR IGNORE INTO main.task_import_keys (task_id, content_hash, external_id) '
+    'SELECT task_id, content_hash, external_id FROM archive.task_import_keys WHERE task_id IN (SELECT value FROM json_each(:ids))'
+)
+RESTORE_DELETE_IMPORT_KEYS = (
+    f'DELETE FROM archive.task_import_keys WHERE task_id IN (SELECT value FROM json_each(:ids)) '
+    f'AND task_id NOT IN (SELECT id FROM archive.tasks WHERE {_CHANGED})'
+)
+SELECT_ALL_ARCHIVED_TASKS = f'SELECT {_SELECT_COLUMNS} FROM archive.tasks'
+
+# Сохранённые виды (см. views.py): условия собираются в один запрос по id
+CREATE_SAVED_VIEWS = 'CREATE TABLE IF NOT EXISTS saved_views (name TEXT PRIMARY KEY, definition TEXT NOT NULL)'
+SELECT_SAVED_VIEWS = 'SELECT definition FROM saved_views ORDER BY name'
+UPSERT_SAVED_VIEW = (
+    'INSERT INTO saved_views (name, definition) VALUES (:name, :definition) '
+    'ON CONFLICT (name) DO UPDATE SET definition = excluded.definition'
+)
+DELETE_SAVED_VIEW = 'DELETE FROM saved_views WHERE name = :name'
+# Номер последнего изменения tasks — меняется при любой записи из любого процесса
+SELECT_CHANGE_VERSION = 'SELECT COALESCE(MAX(seq), 0) FROM task_changes'
+
+# Счётчики колонок, поддерживаемые триггерами (см. database.create_table)
+SELECT_TASK_COUNTS = 'SELECT status, priority, count FROM task_counts WHERE count > 0'
+VIEW_SELECT_IDS = 'SELECT id FROM tasks'
+VIEW_STATUS_CONDITION = _STATUSES
+VIEW_PRIORITY_CONDITION = 'priority IN (SELECT value FROM json_each(:priorities))'
+VIEW_DUE_CONDITIONS = {
+    'overdue': "status != 'Завершено' AND due_date <= :today AND (due_date < :today OR due_time < :now_time)",
+    'today': 'due_date = :today',
+    'week': 'due_date BETWEEN :week_start AND :week_end',
+}
+VIEW_COMPLETED_CONDITIONS = {
+    'today': 'completed_at >= :today',
+    'week': 'completed_at >= :week_start',
+    'month': 'completed_at >= :month_start',
+}
+VIEW_TEXT_CONDITION = _SEARCH
+
+# Импорт: индекс хэшей содержимого и внешних ID (см. importer.py)
+CREATE_IMPORT_KEYS = '''
+    CREATE TABLE IF NOT EXISTS task_import_keys (
+        task_id INTEGER PRIMARY KEY,
+        content_hash TEXT,
+        external_id TEXT UNIQUE
+    );
+    CREATE INDEX IF NOT EXISTS task_import_keys_hash ON task_import_keys (content_hash);
+    CREATE TRIGGER IF NOT EXISTS tasks_import_keys_update AFTER UPDATE OF task, description, due_date, due_time ON tasks
+    BEGIN
+        UPDATE task_import_keys SET content_hash = NULL WHERE task_id = NEW.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS tasks_import_keys_delete AFTER DELETE ON tasks
+    BEGIN
+        DELETE FROM task_import_keys WHERE task_id = OLD.id;
+    END;
+    CREATE TABLE IF NOT EXISTS database_identity (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        database_id TEXT NOT NULL
+    );
+'''
+# Идентификатор базы пишется в выгрузку: по нему импорт узнаёт свои файлы
+INSERT_DATABASE_ID = 'INSERT OR IGNORE INTO database_identity (id, database_id) VALUES (1, :database_id)'
+SELECT_DATABASE_ID = 'SELECT database_id FROM database_identity WHERE id = 1'
+SELECT_UNHASHED_TASKS = (
+    'SELECT id, task, description, due_date, due_time FROM tasks '
+    'WHERE id NOT IN (SELECT task_id FROM task_import_keys WHERE content_hash IS NOT NULL)'
+)
+UPSERT_IMPORT_HASH = (
+    'INSERT INTO task_import_keys (task_id, content_hash) VALUES (:task_id, :content_hash) '
+    'ON CONFLICT (task_id) DO UPDATE SET content_hash = excluded.content_hash'
+)
+INSERT_IMPORT_KEY = (
+    'INSERT INTO task_import_keys (task_id, content_hash, external_id) VALUES (:task_id, :content_hash, :external_id)'
+)
+LINK_EXTERNAL_ID = 'UPDATE task_import_keys SET external_id = :external_id WHERE task_id = :task_id AND external_id IS NULL'
+SELECT_TASKS_BY_HASHES = (
+    'SELECT content_hash, task_id FROM task_import_keys WHERE content_hash IN (SELECT value FROM json_each(:hashes))'
+)
+SELECT_TASKS_BY_EXTERNAL_IDS = (
+    'SELECT external_id, task_id FROM task_import_keys '
+    'WHERE external_id IN (SELECT value FROM json_each(:external_ids))'
+)
+SELECT_TASK_IDS_AFTER_ID = 'SELECT id FROM tasks WHERE id > :id ORDER BY id'
+# Архивные задачи тоже участвуют в поиске дубликатов (см. archive.py)
+SELECT_UNHASHED_ARCHIVED_TASKS = (
+    'SELECT id, task, description, due_date, due_time FROM archive.tasks '
+    'WHERE id NOT IN (SELECT task_id FROM archive.task_import_keys WHERE content_hash IS NOT NULL)'
+)
+UPSERT_ARCHIVED_IMPORT_HASH = (
+    'INSERT INTO archive.task_import_keys (task_id, content_hash) VALUES (:task_id, :content_hash) '
+    'ON CONFLICT (task_id) DO UPDATE SET content_hash = excluded.content_hash'
+)
+SELECT_ARCHIVED_HASHES = (
+    'SELECT DISTINCT content_hash FROM archive.task_import_keys WHERE content_hash IN (SELECT value FROM json_each(:hashes))'
+)
+SELECT_EXISTING_TASK_IDS = f'SELECT id FROM tasks WHERE {_CHANGED}'
+
+# Повторяющиеся задачи: серии и их созданные экземпляры (см. recurrence.py)
+CREATE_RECURRENCE_TABLES = '''
+    CREATE TABLE IF NOT EXISTS task_series (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task TEXT NOT NULL,
+        description TEXT,
+        due_time TEXT,
+        priority TEXT,
+        rule TEXT NOT NULL,
+        start_date TEXT NOT NULL,
+        materialized_until TEXT
+    );
+    CREATE TABLE IF NOT EXISTS series_occurrences (
+        task_id INTEGER PRIMARY KEY,
+        series_id INTEGER NOT NULL,
+        occurrence_date TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS series_occurrences_series ON series_occurrences (series_id);
+    CREATE TRIGGER IF NOT EXISTS tasks_occurrence_delete AFTER DELETE ON tasks
+    BEGIN
+        DELETE FROM series_occurrences WHERE task_id = OLD.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS task_series_delete AFTER DELETE ON task_series
+    BEGIN
+        DELETE FROM series_occurrences WHERE series_id = OLD.id;
+    END;
+'''
+INSERT_SERIES = (
+    'INSERT INTO task_series (task, description, due_time, priority, rule, start_date) '
+    'VALUES (:task, :description, :due_time, :priority, :rule, :start_date)'
+)
+DELETE_SERIES = 'DELETE FROM task_series WHERE id = :id'
+SELECT_SERIES_OF_TASK = 'SELECT series_id FROM series_occurrences WHERE task_id = :task_id'
+# Серии, которым нужны экземпляры: наступил новый день или не осталось открытых
+_SERIES_OPEN = (
+    'EXISTS (SELECT 1 FROM series_occurrences o JOIN tasks t ON t.id = o.task_id '
+    "WHERE o.series_id = s.id AND t.status != 'Завершено')"
+)
+_SERIES_TO_MATERIALIZE = (
+    f'SELECT id, task, description, due_time, priority, rule, start_date, materialized_until, {_SERIES_OPEN} '
+    f'FROM task_series s WHERE (materialized_until IS NULL OR materialized_until < :today OR NOT {_SERIES_OPEN})'
+)
+SELECT_SERIES_TO_MATERIALIZE = _SERIES_TO_MATERIALIZE
+SELECT_SERIES_TO_MATERIALIZE_BY_IDS = f'{_SERIES_TO_MATERIALIZE} AND id IN (SELECT value FROM json_each(:ids))'
+INSERT_OCCURRENCE = (
+    'INSERT INTO series_occurrences (task_id, series_id, occurrence_date) VALUES (:task_id, :series_id, :occurrence_date)'
+)
+UPDATE_SERIES_MATERIALIZED = 'UPDATE task_series SET materialized_until = :materialized_until WHERE id = :id'
+SELECT_SERIES_OF_TASKS = 'SELECT DISTINCT series_id FROM series_occurrences WHERE task_id IN (SELECT value FROM json_each(:ids))'
+
+# Обновление одного столбца — для отмены изменений, где известны только изменённые поля
+UPDATE_TASK_COLUMN = {column: f'UPDATE tasks SET {column} = :value WHERE id = :id' for column in TASK_FIELDS}
+# Снимок строки для журнала отмены: кроме самой задачи — её строки в таблицах,
+# которые триггеры очищают при удалении (экземпляр серии и ключи импорта)
+UNDO_SIDE_FIELDS = ('series_id', 'occurrence_date', 'content_hash', 'external_id', 'series')
+SELECT_UNDO_ROWS = (
+    f'SELECT {", ".join("t." + column for column in TASK_COLUMNS)}, '
+    'o.series_id, o.occurrence_date, k.content_hash, k.external_id, '
+    'CASE WHEN s.id IS NOT NULL THEN json_array('
+    's.task, s.description, s.due_time, s.priority, s.rule, s.start_date, s.materialized_until) END '
+    'FROM tasks t LEFT JOIN series_occurrences o ON o.task_id = t.id '
+    'LEFT JOIN task_series s ON s.id = o.series_id LEFT JOIN task_import_keys k ON k.task_id = t.id '
+    'WHERE t.id IN (SELECT value FROM json_each(:ids))'
+)
+# Отмена добавления последнего экземпляра удаляет и серию, созданную вместе
+# с ним (см. TaskManager.add_task); повтор добавления восстанавливает её из снимка
+DELETE_ORPHAN_SERIES = (
+    'DELETE FROM task_series WHERE id = :series_id '
+    'AND NOT EXISTS (SELECT 1 FROM series_occurrences WHERE series_id = :series_id)'
+)
+RESTORE_SERIES = (
+    'INSERT OR IGNORE INTO task_series '
+    '(id, task, description, due_time, priority, rule, start_date, materialized_until) '
+    "SELECT :series_id, json_extract(:series, '$[0]'), json_extract(:series, '$[1]'), "
+    "json_extract(:series, '$[2]'), json_extract(:series, '$[3]'), json_extract(:series, '$[4]'), "
+    "json_extract(:series, '$[5]'), json_extract(:series, '$[6]') WHERE :series IS NOT NULL"
+)
+# Серия могла быть остановлена после удаления задачи — тогда связь не возвращается
+RESTORE_OCCURRENCE = (
+    'INSERT INTO series_occurrences (task_id, series_id, occurrence_date) '
+    'SELECT :task_id, :series_id, :occurrence_date WHERE EXISTS (SELECT 1 FROM task_series WHERE id = :series_id)'
+)
+# Отмена создания будущего повторения возвращает серию на день раньше, чтобы
+# следующее завершение создало его снова; повтор — продвигает обратно
+REWIND_SERIES_MATERIALIZED = (
+    "UPDATE task_series SET materialized_until = date(:occurrence_date, '-1 day') "
+    "WHERE id = :series_id AND materialized_until = :occurrence_date AND :occurrence_date > date('now', 'localtime')"
+)
+ADVANCE_SERIES_MATERIALIZED = (
+    'UPDATE task_series SET materialized_until = :occurrence_date '
+    'WHERE id = :series_id AND (materialized_until IS NULL OR materialized_until < :occurrence_date)'
+)
+RESTORE_IMPORT_KEY = (
+    'INSERT OR IGNORE INTO task_import_keys (task_id, content_hash, external_id) '
+    'VALUES (:task_id, :content_hash, :external_id)'
+)
+
+ALL_STATEMENTS = (
+    LOAD_TASKS, LOAD_TASKS_BY_PRIORITY, LIST_TASKS_PAGE, LIST_TASKS_PAGE_BY_PRIORITY, LOAD_CHANGED_TASKS, LOAD_CHANGED_TASKS_BY_PRIORITY,
+    SELECT_TASK, SELECT_TASKS_BY_IDS, SELECT_TASKS_BY_IDS_AND_PRIORITY, SELECT_TASKS_AFTER_ID,
+    SELECT_MAX_TASK_ID, EXACT_MATCH_IDS, FUZZY_CANDIDATES, TRIGRAM_FREQUENCIES, SELECT_ALL_TASKS, SELECT_DESCRIPTION, SELECT_REMINDER_CANDIDATES,
+    INSERT_TASK, INSERT_TASK_WITH_ID, UPDATE_TASK, UPDATE_TASK_STATUS, DELETE_TASK,
+    ARCHIVE_CANDIDATES, ARCHIVE_COPY, ARCHIVE_COPY_IMPORT_KEYS, ARCHIVE_DELETE, LOAD_ARCHIVE, LOAD_ARCHIVE_BY_PRIORITY,
+    SELECT_ARCHIVED_DESCRIPTION, RESTORE_COPY, RESTORE_IMPORT_KEYS, RESTORE_DELETE, RESTORE_DELETE_IMPORT_KEYS,
+    SELECT_ALL_ARCHIVED_TASKS,
+    SELECT_SAVED_VIEWS, UPSERT_SAVED_VIEW, DELETE_SAVED_VIEW, SELECT_CHANGE_VERSION, SELECT_TASK_COUNTS,
+    SELECT_UNHASHED_TASKS, UPSERT_IMPORT_HASH, INSERT_IMPORT_KEY, LINK_EXTERNAL_ID,
+    SELECT_TASKS_BY_HASHES, SELECT_TASKS_BY_EXTERNAL_IDS, SELECT_TASK_IDS_AFTER_ID, SELECT_EXISTING_TASK_IDS,
+    SELECT_UNHASHED_ARCHIVED_TASKS, UPSERT_ARCHIVED_IMPORT_HASH, SELECT_ARCHIVED_HASHES,
+    INSERT_DATABASE_ID, SELECT_DATABASE_ID,
+    INSERT_SERIES, DELETE_SERIES, SELECT_SERIES_OF_TASK, SELECT_SERIES_TO_MATERIALIZE,
+    SELECT_SERIES_TO_MATERIALIZE_BY_IDS, INSERT_OCCURRENCE, UPDATE_SERIES_MATERIALIZED, SELECT_SERIES_OF_TASKS,
+    SELECT_UNDO_ROWS, DELETE_ORPHAN_SERIES, RESTORE_SERIES, RESTORE_OCCURRENCE, REWIND_SERIES_MATERIALIZED,
+    ADVANCE_SERIES_MATERIALIZED, RESTORE_IMPORT_KEY,
+) + tuple(UPDATE_TASK_COLUMN.values())
+
+# Имена запросов для метрик (см. instrumentation.sql_label)
+STATEMENT_NAMES = {
+    value: name for name, value in list(globals().items())
+    if not name.startswith('_') and isinstance(value, str) and value in ALL_STATEMENTS
+}
+STATEMENT_NAMES.update({text: f'UPDATE_TASK_COLUMN[{column}]' for column, text in UPDATE_TASK_COLUMN.items()})
+
+# Размер кэша подготовленных запросов: все запросы модуля плюс запас
+# для служебных (PRAGMA, журнал изменений)
+STATEMENT_CACHE_SIZE = len(ALL_STATEMENTS) + 32
+
+
+def statuses_param(statuses):
+    return json.dumps(list(statuses), ensure_ascii=False)
+
+
+def load_tasks_query(filter_text='', priority_filter='Все', statuses=STATUSES):
+    """Запрос и параметры для загрузки доски (колонок statuses) с учётом поиска и фильтра."""
+    params = {'pattern': f'%{filter_text}%', 'statuses': statuses_param(statuses)}
+    if priority_filter != 'Все':
+        params['priority'] = priority_filter
+        return LOAD_TASKS_BY_PRIORITY, params
+    return LOAD_TASKS, params
+
+
+def list_tasks_query(priority_filter='Все', statuses=STATUSES, after=None, limit=200):
+    """
+    Запрос и параметры для следующей страницы списка задач API.
+    after — id последней уже полученной задачи или None.
+    """
+    params = {'statuses': statuses_param(statuses), 'after': after or 0, 'limit': limit}
+    if priority_filter != 'Все':
+        params['priority'] = priority_filter
+        return LIST_TASKS_PAGE_BY_PRIORITY, params
+    return LIST_TASKS_PAGE, params
+
+
+def ids_param(task_ids):
+    """Список id в виде JSON-массива для запросов с json_each(:ids)."""
+    return '[' + ','.join(str(int(task_id)) for task_id in task_ids) + ']'
+
+
+def changed_tasks_query(task_ids, filter_text='', priority_filter='Все', statuses=STATUSES):
+    """Запрос и параметры для перечитывания задач task_ids с учётом фильтра."""
+    params = {'ids': ids_param(task_ids), 'pattern': f'%{filter_text}%', 'statuses': statuses_param(statuses)}
+    if priority_filter != 'Все':
+        params['priority'] = priority_filter
+        return LOAD_CHANGED_TASKS_BY_PRIORITY, params
+    return LOAD_CHANGED_TASKS, params
+
+
+def tasks_by_ids_query(task_ids, priority_filter='Все'):
+    """Запрос и параметры для задач task_ids с учётом фильтра по приоритету."""
+    params = {'ids': ids_param(task_ids)}
+    if priority_filter != 'Все':
+        params['priority'] = priority_filter
+        return SELECT_TASKS_BY_IDS_AND_PRIORITY, params
+    return SELECT_TASKS_BY_IDS, params
+
+
+def load_archive_query(filter_text='', priority_filter='Все', after=None, limit=200):
+    """
+    Запрос и параметры для следующей страницы архива.
+    after — (completed_at, id) последней уже показанной задачи или None.
+    """
+    completed_at, task_id = after if after is not None else ('\uffff', 2 ** 63 - 1)
+    params = {'pattern': f'%{filter_text}%', 'completed_at': completed_at, 'id': task_id, 'limit': limit}
+    if priority_filter != 'Все':
+        params['priority'] = priority_filter
+        return LOAD_ARCHIVE_BY_PRIORITY, params
+    return LOAD_ARCHIVE, params
+
+
+def task_params(task, description, due_date, due_time, priority, status, completed_at=None, task_id=None):
+    """Именованные параметры для INSERT_TASK / UPDATE_TASK."""
+    params = {
+        'task': task,
+        'description': description,
+        'due_date': due_date,
+        'due_time': due_time,
+        'priority': priority,
+        'status': status,
+        'completed_at': completed_at,
+    }
+    if task_id is not None:
+        params['id'] = task_id
+    return params
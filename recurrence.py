@@ -0,0 +1,198 @@
+# recurrence.py
+#
+# Повторяющиеся задачи.
+# Серия хранится один раз в task_series: шаблон задачи и правило повторения
+# в упрощённом формате RRULE (FREQ=DAILY|WEEKLY|MONTHLY, INTERVAL, BYDAY,
+# BYMONTHDAY, UNTIL). Экземпляры — обычные строки tasks, но создаются лениво:
+# только на сегодняшний день (его видит доска и проверка напоминаний) и
+# следующий, когда у серии не осталось открытых экземпляров, — например,
+# после переноса текущего в "Завершено". Пропущенные, пока приложение было
+# закрыто, повторения схлопываются в одно.
+
+import calendar
+from collections import namedtuple
+from datetime import date, timedelta
+from itertools import takewhile
+
+import queries
+from instrumentation import logger, timed
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+WEEKDAY_NAMES = ('пн', 'вт', 'ср', 'чт', 'пт', 'сб', 'вс')
+
+# Варианты повторения в форме добавления задачи
+REPEAT_PRESETS = {
+    'Не повторять': None,
+    'Каждый день': 'FREQ=DAILY',
+    'По будням': 'FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR',
+    'Каждую неделю': 'FREQ=WEEKLY',
+    'Каждый месяц': 'FREQ=MONTHLY',
+}
+
+# byday — номера дней недели (0 — понедельник); bymonthday — число месяца
+# (отрицательное считается с конца месяца)
+Rule = namedtuple('Rule', ('freq', 'interval', 'byday', 'bymonthday', 'until'))
+
+
+def create_recurrence_tables(conn):
+    conn.executescript(queries.CREATE_RECURRENCE_TABLES)
+
+
+def parse_rule(text):
+    """Разбирает правило вида FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH; бросает ValueError."""
+    try:
+        parts = dict(part.split('=', 1) for part in text.upper().replace(' ', '').split(';') if part)
+        freq = parts.get('FREQ')
+        if freq not in FREQUENCIES:
+            raise ValueError(f'неизвестная частота: {freq}')
+        interval = int(parts.get('INTERVAL', 1))
+        byday = tuple(sorted(WEEKDAYS.index(day) for day in parts['BYDAY'].split(','))) if 'BYDAY' in parts else ()
+        bymonthday = int(parts['BYMONTHDAY']) if 'BYMONTHDAY' in parts else None
+        until = date.fromisoformat(parts['UNTIL']) if 'UNTIL' in parts else None
+    except (KeyError, IndexError) as e:
+        raise ValueError(f'неверное правило повторения: {text}') from e
+    if interval < 1 or (bymonthday is not None and not 1 <= abs(bymonthday) <= 31):
+        raise ValueError(f'неверное правило повторения: {text}')
+    return Rule(freq, interval, byday, bymonthday, until)
+
+
+def format_rule(rule):
+    parts = [f'FREQ={rule.freq}']
+    if rule.interval != 1:
+        parts.append(f'INTERVAL={rule.interval}')
+    if rule.byday:
+        parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in rule.byday))
+    if rule.bymonthday is not None:
+        parts.append(f'BYMONTHDAY={rule.bymonthday}')
+    if rule.until is not None:
+        parts.append(f'UNTIL={rule.until.isoformat()}')
+    return ';'.join(parts)
+
+
+def describe_rule(rule):
+    """Описание правила для интерфейса: "каждые 2 нед.: пн, чт"."""
+    unit = {'DAILY': 'дн.', 'WEEKLY': 'нед.', 'MONTHLY': 'мес.'}[rule.freq]
+    text = f'каждые {rule.interval} {unit}'
+    if rule.byday:
+        text += ': ' + ', '.join(WEEKDAY_NAMES[day] for day in rule.byday)
+    if rule.bymonthday is not None:
+        text += f', {rule.bymonthday}-го' if rule.bymonthday > 0 else ', в последний день'
+    if rule.until is not None:
+        text += f', до {rule.until.isoformat()}'
+    return text
+
+
+def _month_day(year, month, day):
+    last = calendar.monthrange(year, month)[1]
+    # Дня нет в коротком месяце — берётся последний день месяца
+    return date(year, month, min(day, last) if day > 0 else max(1, last + day + 1))
+
+
+def _dates(rule, start, after):
+    if rule.freq == 'DAILY':
+        step = 0 if after < start else (after - start).days // rule.interval + 1
+        while True:
+            yield start + timedelta(days=step * rule.interval)
+            step += 1
+    elif rule.freq == 'WEEKLY':
+        week_start = start - timedelta(days=start.weekday())
+        step = 0 if after < start else (after - week_start).days // 7 // rule.interval
+        while True:
+            base = week_start + timedelta(weeks=step * rule.interval)
+            for weekday in rule.byday or (start.weekday(),):
+                yield base + timedelta(days=weekday)
+            step += 1
+    else:
+        day = rule.bymonthday or start.day
+        first_month = start.year * 12 + start.month - 1
+        step = 0 if after < start else (after.year * 12 + after.month - 1 - first_month) // rule.interval
+        while True:
+            year, month = divmod(first_month + step * rule.interval, 12)
+            yield _month_day(year, month + 1, day)
+            step += 1
+
+
+def occurrences(rule, start, after):
+    """Даты повторений серии, начатой start, строго после after, по возрастанию."""
+    dates = (value for value in _dates(rule, start, after) if value >= start and value > after)
+    if rule.until is not None:
+        dates = takewhile(lambda value: value <= rule.until, dates)
+    return dates
+
+
+def create_series(conn, task, description, due_date, due_time, priority, rule_text):
+    """Создаёт серию с первым повторением не раньше due_date. Возвращает id серии."""
+    parse_rule(rule_text)
+    with conn:
+        cursor = conn.execute(queries.INSERT_SERIES, {
+            'task': task, 'description': description, 'due_time': due_time,
+            'priority': priority, 'rule': rule_text, 'start_date': due_date,
+        })
+    return cursor.lastrowid
+
+
+def delete_series(conn, series_id):
+    """Останавливает серию; уже созданные экземпляры остаются обычными задачами."""
+    with conn:
+        conn.execute(queries.DELETE_SERIES, {'id': series_id})
+
+
+def series_of_task(conn, task_id):
+    row = conn.execute(queries.SELECT_SERIES_OF_TASK, {'task_id': task_id}).fetchone()
+    return row[0] if row else None
+
+
+def materialize(conn, today=None, series_ids=None):
+    """
+    Создаёт недостающие экземпляры серий series_ids (None — всех серий).
+    Возвращает id созданных задач.
+    """
+    today = today or date.today()
+    if series_ids is None:
+        query, params = queries.SELECT_SERIES_TO_MATERIALIZE, {'today': today.isoformat()}
+    else:
+        query = queries.SELECT_SERIES_TO_MATERIALIZE_BY_IDS
+        params = {'today': today.isoformat(), 'ids': queries.ids_param(series_ids)}
+    # Обычно делать нечего — тогда обходимся без блокировки записи
+    if conn.execute(query, params).fetchone() is None:
+        return []
+    task_ids = []
+    with timed('recurrence.materialize'):
+        with conn:
+            # Блокируем запись сразу: два экземпляра приложения не создадут один день дважды
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute(query, params).fetchall()
+            for series_id, task, description, due_time, priority, rule_text, start_date, materialized, has_open in rows:
+                try:
+                    rule = parse_rule(rule_text)
+                except ValueError as e:
+                    logger.error('Серия %s: %s', series_id, e)
+                    continue
+                start = date.fromisoformat(start_date)
+                after = date.fromisoformat(materialized) if materialized else start - timedelta(days=1)
+                due = list(takewhile(lambda value: value <= today, occurrences(rule, start, after)))
+                # Из пропущенных повторений остаётся только последнее
+                dates = due[-1:]
+                if not dates and not has_open:
+                    following = next(occurrences(rule, start, max(after, today)), None)
+                    if following is None:
+                        # Правило исчерпано (UNTIL) — серия больше не нужна
+                        conn.execute(queries.DELETE_SERIES, {'id': series_id})
+                        continue
+                    dates = [following]
+                for value in dates:
+                    cursor = conn.execute(queries.INSERT_TASK, queries.task_params(
+                        task, description, value.isoformat(), due_time, priority, 'Сделать'
+                    ))
+                    conn.execute(queries.INSERT_OCCURRENCE, {
+                        'task_id': cursor.lastrowid, 'series_id': series_id, 'occurrence_date': value.isoformat()
+                    })
+                    task_ids.append(cursor.lastrowid)
+                materialized_until = max([after, today] + dates)
+                conn.execute(queries.UPDATE_SERIES_MATERIALIZED, {
+                    'id': series_id, 'materialized_until': materialized_until.isoformat()
+                })
+    if task_ids:
+        logger.info('Созданы повторения задач: %d', len(task_ids))
+    return task_ids
@@ -0,0 +1,210 @@
+# search.py
+#
+# Нечёткий поиск по задачам на основе триграмм.
+# Индекс — виртуальная таблица FTS5 с токенизатором trigram поверх tasks
+# (external content), поддерживаемая триггерами при каждой записи.
+# Задачи, содержащие запрос целиком, находятся все (как и при поиске LIKE)
+# и получают высшую оценку; SearchResults отдаёт их страницами по
+# возрастанию id, чтобы доска показывала первые и подгружала остальные
+# при прокрутке. За ними идут до CANDIDATE_LIMIT похожих задач, в которых
+# встречается не меньше MIN_SIMILARITY триграмм запроса; они ранжируются
+# по доле совпавших триграмм, так что опечатки вроде "deply" находят
+# "deploy". Кандидатов дают самые редкие триграммы запроса
+# (частоты берутся из tasks_fts_vocab): задача, в которой есть нужная доля
+# триграмм, обязательно содержит хотя бы одну из них.
+# Ранжирование bm25 внутри FTS5 не используется: на больших таблицах оно
+# требует оценки всех совпадений и стоит секунды.
+#
+# Если SQLite собран без FTS5, индекс не создаётся и приложение
+# использует обычный поиск через LIKE.
+
+import math
+import json
+from functools import lru_cache
+
+import queries
+from instrumentation import logger, timed
+
+# Минимальная доля триграмм запроса, которая должна найтись в задаче
+MIN_SIMILARITY = 0.5
+# Сколько похожих (не точных) задач возвращать
+CANDIDATE_LIMIT = 500
+# Сколько кандидатов с наибольшим числом редких триграмм оценивать
+CANDIDATE_SCAN_LIMIT = 5000
+# Размер страницы при чтении точных вхождений
+EXACT_PAGE_SIZE = 5000
+
+_available = None
+
+
+def create_search_index(conn):
+    """Создаёт триграммный индекс и триггеры; при первом создании заполняет его."""
+    global _available
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'"
+    ).fetchone() is not None
+    try:
+        conn.executescript('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+                task, description, content='tasks', content_rowid='id', tokenize='trigram'
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts_vocab USING fts5vocab(tasks_fts, 'row');
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks
+            BEGIN
+                INSERT INTO tasks_fts (rowid, task, description) VALUES (NEW.id, NEW.task, NEW.description);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks
+            BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, task, description) VALUES ('delete', OLD.id, OLD.task, OLD.description);
+            END;
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF task, description ON tasks
+            BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, task, description) VALUES ('delete', OLD.id, OLD.task, OLD.description);
+                INSERT INTO tasks_fts (rowid, task, description) VALUES (NEW.id, NEW.task, NEW.description);
+            END;
+        ''')
+        if not exists:
+            conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+        _available = True
+    except Exception as e:
+        logger.warning('Триграммный индекс недоступен, используется поиск LIKE: %s', e)
+        _available = False
+
+
+def is_available(conn):
+    global _available
+    if _available is None:
+        _available = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'"
+        ).fetchone() is not None
+    return _available
+
+
+def trigrams(text):
+    text = (text or '').lower()
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+def is_fuzzy_query(text):
+    # Триграммы есть только у запросов длиной от трёх символов
+    return len(text.strip()) >= 3
+
+
+def similarity(query_trigrams, task_text, description):
+    """Доля триграмм запроса, встречающихся в названии или описании задачи."""
+    if not query_trigrams:
+        return 0.0
+    document = trigrams(task_text) | trigrams(description)
+    return len(query_trigrams & document) / len(query_trigrams)
+
+
+def _quote(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def rare_trigrams(conn, query_trigrams):
+    """
+    Самые редкие триграммы запроса, хотя бы одна из которых есть в любой
+    задаче с долей совпадений не ниже MIN_SIMILARITY: если нужно required
+    из n триграмм, достаточно n - required + 1 самых редких.
+    """
+    required = max(1, math.ceil(len(query_trigrams) * MIN_SIMILARITY))
+    frequencies = dict(conn.execute(
+        queries.TRIGRAM_FREQUENCIES, {'terms': json.dumps(sorted(query_trigrams))}
+    ).fetchall())
+    ordered = sorted(query_trigrams, key=lambda trigram: (frequencies.get(trigram, 0), trigram))
+    return ordered[:len(query_trigrams) - required + 1]
+
+
+def similar_tasks(conn, text, query_trigrams, limit=CANDIDATE_LIMIT):
+    """
+    До limit пар (id, оценка) для задач без точного вхождения text,
+    по убыванию оценки. Сначала берутся кандидаты, где совпало больше
+    редких триграмм.
+    """
+    phrase = _quote(text)
+    terms = [f'{_quote(trigram)} NOT {phrase}' for trigram in rare_trigrams(conn, query_trigrams)]
+    similar = []
+    for task_id, task_text, description in conn.execute(
+        queries.FUZZY_CANDIDATES, {'terms': json.dumps(terms), 'limit': CANDIDATE_SCAN_LIMIT}
+    ).fetchall():
+        score = similarity(query_trigrams, task_text, description)
+        if score >= MIN_SIMILARITY:
+            similar.append((task_id, score))
+    similar.sort(key=lambda item: (-item[1], item[0]))
+    return similar[:limit]
+
+
+class SearchResults:
+    """
+    Результаты поиска text, читаемые страницами: сначала точные вхождения
+    по возрастанию id с оценкой 1.0, затем до limit похожих задач по
+    убыванию оценки. Порядок совпадает с сортировкой доски (-оценка, id).
+    """
+
+    def __init__(self, text, limit=CANDIDATE_LIMIT):
+        self.text = text.strip()
+        self.query_trigrams = trigrams(self.text)
+        self.limit = limit
+        self.last_exact_id = 0
+        # Похожие задачи ищутся, когда точные вхождения закончились
+        self.similar = None
+        self.exhausted = not self.query_trigrams
+
+    def next_page(self, conn, size):
+        """Следующие до size пар (id, оценка); после последней exhausted = True."""
+        page = []
+        if self.exhausted:
+            return page
+        with timed('search.fuzzy'):
+            if self.similar is None:
+                # Точные вхождения (фраза из триграмм = подстрока) содержат
+                # все триграммы запроса; их число не ограничено
+                rows = conn.execute(queries.EXACT_MATCH_IDS, {
+                    'match': _quote(self.text), 'after': self.last_exact_id, 'limit': size,
+                }).fetchall()
+                page = [(row[0], 1.0) for row in rows]
+                if rows:
+                    self.last_exact_id = rows[-1][0]
+                if len(rows) < size:
+                    self.similar = similar_tasks(conn, self.text, self.query_trigrams, self.limit)
+            if self.similar is not None:
+                count = size - len(page)
+                page += self.similar[:count]
+                del self.similar[:count]
+                self.exhausted = not self.similar
+        return page
+
+
+def search(conn, text, limit=CANDIDATE_LIMIT):
+    """
+    Возвращает словарь id -> оценка для задач, похожих на text,
+    с оценкой не ниже MIN_SIMILARITY. Задачи, содержащие text целиком,
+    возвращаются все с оценкой 1.0; limit ограничивает только похожие.
+    """
+    results = SearchResults(text, limit)
+    scores = {}
+    while not results.exhausted:
+        scores.update(results.next_page(conn, EXACT_PAGE_SIZE))
+    return scores
+
+
+# Вызывается при каждой отрисовке видимого элемента найденной задачи
+@lru_cache(maxsize=4096)
+def highlight_spans(text, display_text):
+    """Отрезки (начало, конец) в display_text, покрытые триграммами запроса text."""
+    query_trigrams = trigrams(text.strip())
+    lowered = display_text.lower()
+    covered = [False] * len(lowered)
+    for index in range(len(lowered) - 2):
+        if lowered[index:index + 3] in query_trigrams:
+            covered[index] = covered[index + 1] = covered[index + 2] = True
+    spans = []
+    start = None
+    for index, flag in enumerate(covered + [False]):
+        if flag and start is None:
+            start = index
+        elif not flag and start is not None:
+            spans.append((start, index))
+            start = None
+    return spans
@@ -0,0 +1,160 @@
+# undo.py
+#
+# Журнал отмены/повтора действий с задачами.
+# Каждое действие хранится как набор дельт по строкам: для изменения —
+# только изменившиеся столбцы (было/стало), для добавления и удаления —
+# одна полная строка вместе со связанными строками вспомогательных таблиц
+# (экземпляр серии, ключи импорта), которые триггеры удаляют вместе с
+# задачей, и снимком серии: отмена добавления задачи удаляет серию, у которой
+# не осталось экземпляров, а повтор создаёт её заново. Общий объём журнала ограничен, старые действия вытесняются первыми.
+
+import sys
+from collections import deque, namedtuple
+
+import queries
+from queries import TASK_FIELDS, UNDO_SIDE_FIELDS
+
+# Столбцы снимка строки: поля задачи и связанные значения вспомогательных таблиц
+ROW_FIELDS = TASK_FIELDS + UNDO_SIDE_FIELDS
+
+# Ограничение памяти журнала (приблизительная оценка, в байтах)
+UNDO_MEMORY_LIMIT = 8 * 1024 * 1024
+
+# before/after — значения столбцов columns до и после действия.
+# before = None: строка была добавлена; after = None: строка была удалена.
+Change = namedtuple('Change', ('task_id', 'columns', 'before', 'after'))
+
+Command = namedtuple('Command', ('label', 'changes', 'size'))
+
+
+def fetch_rows(conn, task_ids):
+    """Текущие строки задач task_ids: словарь id -> кортеж значений ROW_FIELDS."""
+    if not task_ids:
+        return {}
+    cursor = conn.execute(queries.SELECT_UNDO_ROWS, {'ids': queries.ids_param(task_ids)})
+    return {row[0]: row[1:] for row in cursor.fetchall()}
+
+
+def diff_rows(before_rows, after_rows):
+    """Список дельт между двумя снимками строк (см. fetch_rows)."""
+    changes = []
+    for task_id in sorted(set(before_rows) | set(after_rows)):
+        before = before_rows.get(task_id)
+        after = after_rows.get(task_id)
+        if before is None or after is None:
+            changes.append(Change(task_id, ROW_FIELDS, before, after))
+            continue
+        # Вспомогательные значения при изменении задачи поддерживают триггеры и импорт
+        changed = [index for index, (old, new) in enumerate(zip(before[:len(TASK_FIELDS)], after)) if old != new]
+        if changed:
+            changes.append(Change(
+                task_id,
+                tuple(TASK_FIELDS[index] for index in changed),
+                tuple(before[index] for index in changed),
+                tuple(after[index] for index in changed),
+            ))
+    return changes
+
+
+def _estimate_size(changes):
+    size = sys.getsizeof(changes)
+    for change in changes:
+        size += sys.getsizeof(change)
+        for values in (change.before, change.after):
+            if values is not None:
+                size += sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
+    return size
+
+
+def _apply(conn, change, target, source):
+    if target is None:
+        conn.execute(queries.DELETE_TASK, {'id': change.task_id})
+        params = dict(zip(ROW_FIELDS, source))
+        if params['series_id'] is not None:
+            conn.execute(queries.REWIND_SERIES_MATERIALIZED, params)
+            if change.before is None:
+                conn.execute(queries.DELETE_ORPHAN_SERIES, params)
+    elif source is None:
+        params = dict(zip(ROW_FIELDS, target))
+        params['id'] = params['task_id'] = change.task_id
+        conn.execute(queries.INSERT_TASK_WITH_ID, params)
+        if params['series_id'] is not None:
+            if change.before is None:
+                conn.execute(queries.RESTORE_SERIES, params)
+            conn.execute(queries.RESTORE_OCCURRENCE, params)
+            conn.execute(queries.ADVANCE_SERIES_MATERIALIZED, params)
+        if params['content_hash'] is not None or params['external_id'] is not None:
+            conn.execute(queries.RESTORE_IMPORT_KEY, params)
+    else:
+        for column, value in zip(change.columns, target):
+            conn.execute(queries.UPDATE_TASK_COLUMN[column], {'value': value, 'id': change.task_id})
+
+
+class UndoStack:
+    def __init__(self, memory_limit=UNDO_MEMORY_LIMIT):
+        self.memory_limit = memory_limit
+        self.memory_used = 0
+        self.undo_commands = deque()
+        self.redo_commands = []
+
+    def push(self, label, changes):
+        """Добавляет выполненное действие. Новое действие очищает стек повтора."""
+        if not changes:
+            return
+        size = _estimate_size(changes)
+        self.redo_commands.clear()
+        if size > self.memory_limit:
+            # Действие не помещается в журнал: отменять более ранние поверх него нельзя
+            self.clear()
+            return
+        self.undo_commands.append(Command(label, changes, size))
+        self.memory_used += size
+        self._evict()
+
+    def _evict(self):
+        # Вытесняем самые старые действия, пока журнал не уложится в лимит
+        while self.memory_used > self.memory_limit and len(self.undo_commands) > 1:
+            self.memory_used -= self.undo_commands.popleft().size
+
+    def record(self, label, before_rows, after_rows):
+        self.push(label, diff_rows(before_rows, after_rows))
+
+    def clear(self):
+        self.undo_commands.clear()
+        self.redo_commands.clear()
+        self.memory_used = 0
+
+    def can_undo(self):
+        return bool(self.undo_commands)
+
+    def can_redo(self):
+        return bool(self.redo_commands)
+
+    def undo_label(self):
+        return self.undo_commands[-1].label if self.undo_commands else ''
+
+    def redo_label(self):
+        return self.redo_commands[-1].label if self.redo_commands else ''
+
+    def undo(self, conn):
+        """Отменяет последнее действие одной транзакцией. Возвращает затронутые id."""
+        command = self.undo_commands[-1]
+        with conn:
+            for change in reversed(command.changes):
+                _apply(conn, change, change.before, change.after)
+        self.undo_commands.pop()
+        self.memory_used -= command.size
+        self.redo_commands.append(command)
+        return [change.task_id for change in command.changes]
+
+    def redo(self, conn):
+        """Повторяет последнее отменённое действие одной транзакцией. Возвращает затронутые id."""
+        command = self.redo_commands[-1]
+        with conn:
+            for change in command.changes:
+                _apply(conn, change, change.after, change.before)
+        self.redo_commands.pop()
+        self.undo_commands.append(command)
+        self.memory_used += command.size
+        self._evict()
+        return [change.task_id for change in command.changes]
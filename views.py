@@ -0,0 +1,129 @@
+# views.py
+#
+# Сохранённые виды доски: сочетание условий по статусу, приоритету,
+# сроку, дате завершения и тексту. Вид компилируется в один
+# параметризованный запрос, возвращающий id подходящих задач. Набор id
+# кэшируется и сбрасывается при любой записи в tasks (по номеру последнего
+# изменения из журнала task_changes), поэтому переключение между видами
+# без новых изменений не обращается к базе вовсе.
+
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import queries
+from instrumentation import timed
+
+View = namedtuple('View', ('name', 'statuses', 'priorities', 'due', 'completed', 'text'))
+
+# Допустимые значения условий и их подписи в интерфейсе
+DUE_RANGES = {None: 'Любой срок', 'overdue': 'Просрочено', 'today': 'Сегодня', 'week': 'Эта неделя'}
+COMPLETED_RANGES = {None: 'Не важно', 'today': 'Сегодня', 'week': 'Эта неделя', 'month': 'Этот месяц'}
+
+BUILTIN_VIEWS = [
+    View('Просроченные', (), (), 'overdue', None, ''),
+    View('На сегодня', (), (), 'today', None, ''),
+    View('На этой неделе', (), (), 'week', None, ''),
+    View('Завершённые за неделю', ('Завершено',), (), None, 'week', ''),
+    View('Срочное в работе', ('Сделать', 'В работе'), ('Высокий',), None, None, ''),
+]
+
+
+def make_view(name, statuses=(), priorities=(), due=None, completed=None, text=''):
+    return View(name, tuple(statuses), tuple(priorities), due, completed, text.strip())
+
+
+def view_to_json(view):
+    return json.dumps(view._asdict(), ensure_ascii=False)
+
+
+def view_from_json(definition):
+    data = json.loads(definition)
+    return make_view(
+        data['name'], data.get('statuses', ()), data.get('priorities', ()),
+        data.get('due'), data.get('completed'), data.get('text', '')
+    )
+
+
+def create_views_table(conn):
+    conn.execute(queries.CREATE_SAVED_VIEWS)
+
+
+def load_saved_views(conn):
+    return [view_from_json(row[0]) for row in conn.execute(queries.SELECT_SAVED_VIEWS).fetchall()]
+
+
+def save_view(conn, view):
+    with conn:
+        conn.execute(queries.UPSERT_SAVED_VIEW, {'name': view.name, 'definition': view_to_json(view)})
+
+
+def delete_view(conn, name):
+    with conn:
+        conn.execute(queries.DELETE_SAVED_VIEW, {'name': name})
+
+
+def _date_params(now):
+    today = now.date()
+    week_start = today - timedelta(days=today.weekday())
+    return {
+        'today': today.isoformat(),
+        'now_time': now.strftime('%H:%M'),
+        'week_start': week_start.isoformat(),
+        'week_end': (week_start + timedelta(days=6)).isoformat(),
+        'month_start': today.replace(day=1).isoformat(),
+    }
+
+
+def compile_view(view, now=None):
+    """Возвращает (sql, params) запроса, выбирающего id задач вида."""
+    dates = _date_params(now or datetime.now())
+    clauses, params = [], {}
+    if view.statuses:
+        clauses.append(queries.VIEW_STATUS_CONDITION)
+        params['statuses'] = queries.statuses_param(view.statuses)
+    if view.priorities:
+        clauses.append(queries.VIEW_PRIORITY_CONDITION)
+        params['priorities'] = json.dumps(list(view.priorities), ensure_ascii=False)
+    if view.due:
+        clauses.append(queries.VIEW_DUE_CONDITIONS[view.due])
+    if view.completed:
+        clauses.append(queries.VIEW_COMPLETED_CONDITIONS[view.completed])
+    if view.text:
+        clauses.append(queries.VIEW_TEXT_CONDITION)
+        params['pattern'] = f'%{view.text}%'
+    sql = queries.VIEW_SELECT_IDS
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    # В запрос передаются только те даты, которые в нём используются
+    params.update({key: value for key, value in dates.items() if f':{key}' in sql})
+    return sql, params
+
+
+def _time_key(view, now):
+    # Результат "просроченных" меняется каждую минуту, остальных — раз в день
+    if view.due == 'overdue':
+        return now.strftime('%Y-%m-%d %H:%M')
+    return now.strftime('%Y-%m-%d')
+
+
+class ViewCache:
+    """Кэш множеств id по видам; сбрасывается при любой записи в tasks."""
+    def __init__(self):
+        self.entries = {}
+
+    def get_ids(self, conn, view):
+        now = datetime.now()
+        version = conn.execute(queries.SELECT_CHANGE_VERSION).fetchone()[0]
+        key = (version, _time_key(view, now))
+        entry = self.entries.get(view)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        with timed('views.query'):
+            sql, params = compile_view(view, now)
+            ids = frozenset(row[0] for row in conn.execute(sql, params).fetchall())
+        self.entries[view] = (key, ids)
+        return ids
+
+    def forget(self, view):
+        self.entries.pop(view, None)